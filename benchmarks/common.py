@@ -0,0 +1,87 @@
+"""Shared setup for the Conference Central benchmarks.
+
+The benchmarks run against the App Engine SDK (set `GAE_SDK` if it is not
+installed in /usr/local/google_appengine, see the README) and import the
+application modules from ../conference_central.
+"""
+
+import collections
+import os
+import sys
+
+GAE_SDK = os.environ.get('GAE_SDK', '/usr/local/google_appengine')
+APP_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), os.pardir, 'conference_central')
+
+
+def setup_paths():
+    """Put the SDK, its bundled libraries and the app on `sys.path`."""
+    sys.path.insert(0, GAE_SDK)
+    import dev_appserver
+    dev_appserver.fix_sys_path()
+    sys.path.insert(0, APP_DIR)
+    os.environ.setdefault('APPLICATION_ID', 'dev~conference-central-bench')
+
+
+def activate_testbed():
+    """Activate datastore, memcache, task queue, search (and friends) stubs."""
+    from google.appengine.datastore import datastore_stub_util
+    from google.appengine.ext import testbed
+
+    bed = testbed.Testbed()
+    bed.activate()
+    # Always-consistent datastore so results don't vary run to run
+    bed.init_datastore_v3_stub(
+        consistency_policy=datastore_stub_util.PseudoRandomHRConsistencyPolicy(
+            probability=1))
+    bed.init_memcache_stub()
+    # root_path picks up queue.yaml (e.g. the pull queue for registrations)
+    bed.init_taskqueue_stub(root_path=APP_DIR)
+    bed.init_app_identity_stub()
+    bed.init_mail_stub()
+    bed.init_search_stub()
+    bed.init_urlfetch_stub()
+    bed.init_user_stub()
+    return bed
+
+
+def sign_in(email):
+    """Make `endpoints.get_current_user()` return the user with `email`."""
+    os.environ['ENDPOINTS_AUTH_EMAIL'] = email
+    os.environ['ENDPOINTS_AUTH_DOMAIN'] = 'gmail.com'
+
+
+class RpcCounter(object):
+
+    """Count API calls (e.g. datastore_v3.Get) and memcache hits."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.calls = collections.Counter()
+        self.memcache_keys = 0
+        self.memcache_hits = 0
+
+    def install(self):
+        """Count the calls made through the current (testbed) API proxy."""
+        from google.appengine.api import apiproxy_stub_map
+        apiproxy_stub_map.apiproxy.GetPostCallHooks().Append(
+            'benchmark_rpc_counter', self._hook)
+
+    def _hook(self, service, call, request, response):
+        self.calls['{0}.{1}'.format(service, call)] += 1
+        if service == 'memcache' and call == 'Get':
+            self.memcache_keys += request.key_size()
+            self.memcache_hits += response.item_size()
+
+    def service_calls(self, service):
+        """Total number of calls made to `service`."""
+        return sum(count for name, count in self.calls.items() if
+                   name.startswith(service + '.'))
+
+    def memcache_hit_rate(self):
+        """Fraction of keys looked up in memcache that were found."""
+        if not self.memcache_keys:
+            return None
+        return float(self.memcache_hits) / self.memcache_keys
@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+
+"""Latency and RPC counts of ConferenceApi endpoints on the testbed stubs.
+
+Seeds synthetic conferences, profiles, speakers and sessions, then drives
+`ConferenceApi` methods directly and prints a JSON report of wall time,
+API calls (datastore, memcache, task queue) and memcache hit rate per
+endpoint.
+
+Usage: python benchmarks/endpoint_benchmark.py [--scale N] [--repeat N]
+"""
+
+import argparse
+import datetime
+import json
+import random
+import time
+
+import common
+common.setup_paths()
+
+from google.appengine.ext import ndb
+from protorpc import message_types
+
+import registrations
+import resource_containers as containers
+import seat_counter
+from conference import ConferenceApi
+from models import Conference
+from models import ConferenceFeedRequestMessage
+from models import ConferenceQueryForms
+from models import Profile
+from models import Session
+from models import Speaker
+
+PUT_BATCH_SIZE = 500
+CONFERENCES_ATTENDED = 5
+
+
+def put_in_batches(entities):
+    """Store `entities` with put_multi, PUT_BATCH_SIZE at a time."""
+    for i in range(0, len(entities), PUT_BATCH_SIZE):
+        ndb.put_multi(entities[i:i + PUT_BATCH_SIZE])
+
+
+def seed(scale):
+    """Seed `scale` sessions with proportionate other entities.
+
+    Returns the seeded profiles and conferences.
+    """
+    rand = random.Random(scale)
+    num_conferences = max(1, scale // 10)
+    num_profiles = max(1, scale // 10)
+    num_speakers = max(1, scale // 20)
+    start = datetime.date(2016, 1, 1)
+
+    profiles = [Profile(key=ndb.Key(Profile, 'user%d@example.com' % i),
+                        displayName='User %d' % i,
+                        mainEmail='user%d@example.com' % i)
+                for i in range(num_profiles)]
+
+    conferences = []
+    for i in range(num_conferences):
+        organizer = profiles[i % num_profiles]
+        conferences.append(Conference(
+            parent=organizer.key, name='Conference %d' % i,
+            organizerUserId=organizer.key.id(),
+            organizerDisplayName=organizer.displayName,
+            topics=[rand.choice(['Python', 'Cloud', 'Web', 'Data'])],
+            city=rand.choice(['London', 'Paris', 'Tokyo', 'Chicago']),
+            startDate=start, month=start.month, endDate=start,
+            maxAttendees=100, seatsAvailable=100))
+    put_in_batches(conferences)
+    for conference in conferences:
+        seat_counter.reset(conference.key, conference.seatsAvailable)
+
+    put_in_batches(profiles)
+    put_in_batches([
+        registrations.new_registration(profile.key, conference.key) for
+        profile in profiles for conference in rand.sample(
+            conferences, min(CONFERENCES_ATTENDED, num_conferences))])
+
+    speakers = [Speaker(name='Speaker %d' % i) for i in range(num_speakers)]
+    put_in_batches(speakers)
+
+    put_in_batches([
+        Session(parent=conferences[i % num_conferences].key,
+                name='Session %d' % i,
+                speaker_key=rand.choice(speakers).key,
+                type_of_session=rand.choice(['talk', 'workshop', 'lab']),
+                date=start, start_time=datetime.time(rand.randint(8, 21)))
+        for i in range(scale)])
+
+    return profiles, conferences
+
+
+def benchmark(counter, call, repeat):
+    """Time `repeat` calls of `call(i)`, counting the RPCs they make."""
+    counter.reset()
+    wall = 0.0
+    for i in range(repeat):
+        # Don't let one call be served from the previous call's context cache
+        ndb.get_context().clear_cache()
+        start = time.time()
+        call(i)
+        wall += time.time() - start
+
+    return {
+        'calls': repeat,
+        'wall_ms_total': round(wall * 1000, 3),
+        'wall_ms_mean': round(wall * 1000 / repeat, 3),
+        'datastore_rpcs_per_call': (
+            float(counter.service_calls('datastore_v3')) / repeat),
+        'memcache_rpcs_per_call': (
+            float(counter.service_calls('memcache')) / repeat),
+        'taskqueue_rpcs_per_call': (
+            float(counter.service_calls('taskqueue')) / repeat),
+        'memcache_hit_rate': counter.memcache_hit_rate(),
+        'rpcs': dict(counter.calls),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', type=int, default=1000,
+                        help='number of sessions to seed (1000-100000)')
+    parser.add_argument('--repeat', type=int, default=20,
+                        help='calls per endpoint')
+    args = parser.parse_args()
+
+    bed = common.activate_testbed()
+    try:
+        start = time.time()
+        profiles, conferences = seed(args.scale)
+        seed_seconds = time.time() - start
+
+        counter = common.RpcCounter()
+        counter.install()
+        # Endpoints serve each request with a new instance, so that its
+        # request-scoped caches (profile_cache) don't outlive the call
+        api = ConferenceApi
+        common.sign_in(profiles[0].mainEmail)
+
+        def wsck(i):
+            return conferences[i % len(conferences)].key.urlsafe()
+
+        conf_get_request = containers.CONF_GET_REQUEST.combined_message_class
+        conference_request = containers.CONFERENCE_REQUEST.combined_message_class
+
+        # Seeded profiles may already be registered for a conference, so
+        # (un)registration runs as a profile with no registrations
+        registrant = Profile(key=ndb.Key(Profile, 'registrant@example.com'),
+                             displayName='Registrant',
+                             mainEmail='registrant@example.com')
+        registrant.put()
+
+        def register_and_unregister(i):
+            request = conf_get_request(websafeConferenceKey=wsck(i))
+            common.sign_in(registrant.mainEmail)
+            try:
+                api().registerForConference(request)
+                api().unregisterFromConference(request)
+            finally:
+                common.sign_in(profiles[0].mainEmail)
+
+        endpoints = [
+            ('queryConferences', lambda i: api().queryConferences(
+                ConferenceQueryForms())),
+            ('getConferenceFeed', lambda i: api().get_conference_feed(
+                ConferenceFeedRequestMessage(
+                    sort='SEATS_AVAILABLE', page=i % 5))),
+            ('getConference', lambda i: api().getConference(
+                conf_get_request(websafeConferenceKey=wsck(i)))),
+            ('getConferencesToAttend', lambda i: api().getConferencesToAttend(
+                message_types.VoidMessage())),
+            ('getProfile', lambda i: api().getProfile(
+                message_types.VoidMessage())),
+            ('getSessionsInWishlist', lambda i: api().get_sessions_in_wishlist(
+                message_types.VoidMessage())),
+            ('getConferenceSessions', lambda i: api().get_conference_sessions(
+                conference_request(conference=wsck(i)))),
+            ('registerForConference+unregisterFromConference',
+             register_and_unregister),
+        ]
+        report = {
+            'scale': {
+                'sessions': args.scale,
+                'conferences': len(conferences),
+                'profiles': len(profiles),
+            },
+            'seed_seconds': round(seed_seconds, 3),
+            'endpoints': dict(
+                (name, benchmark(counter, call, args.repeat)) for
+                name, call in endpoints),
+        }
+        print(json.dumps(report, indent=2, sort_keys=True))
+    finally:
+        bed.deactivate()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+
+"""Cost of confirming conference creation through `mail_queue`.
+
+Queues a confirmation for each of N conference creations (1000 by default)
+by a few organizers, drains the queue with `mail_queue.send_pending` on the
+testbed mail stub and prints a JSON report of the emails actually sent, the
+recorded delivery statuses and the API calls made.
+
+Usage: python benchmarks/mail_benchmark.py [--creations N] [--organizers N]
+"""
+
+import argparse
+import collections
+import json
+import time
+
+import common
+common.setup_paths()
+
+from google.appengine.ext import testbed
+
+import mail_queue
+from models import OutboundEmail
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--creations', type=int, default=1000,
+                        help='conference creations to confirm')
+    parser.add_argument('--organizers', type=int, default=10,
+                        help='organizers creating them')
+    parser.add_argument('--rate', type=float,
+                        default=mail_queue.SENDS_PER_SECOND,
+                        help='emails sent per second at most')
+    args = parser.parse_args()
+
+    bed = common.activate_testbed()
+    try:
+        mail_queue.SENDS_PER_SECOND = args.rate
+        counter = common.RpcCounter()
+        counter.install()
+
+        start = time.time()
+        for i in range(args.creations):
+            mail_queue.enqueue(
+                'conference_created',
+                'organizer%d@example.com' % (i % args.organizers),
+                [{'name': 'Conference %d' % i, 'city': 'London',
+                  'startDate': '2017-01-01', 'endDate': '2017-01-02'}])
+        enqueue_seconds = time.time() - start
+        enqueue_calls = dict(counter.calls)
+
+        counter.reset()
+        start = time.time()
+        while mail_queue.send_pending():
+            pass
+        send_seconds = time.time() - start
+
+        mail_stub = bed.get_stub(testbed.MAIL_SERVICE_NAME)
+        statuses = collections.Counter(
+            email.status for email in OutboundEmail.query())
+        print(json.dumps({
+            'creations': args.creations,
+            'organizers': args.organizers,
+            'emails_sent': len(mail_stub.get_sent_messages()),
+            'statuses': dict(statuses),
+            'enqueue_ms_per_creation': round(
+                enqueue_seconds * 1000 / args.creations, 3),
+            'enqueue_rpcs': enqueue_calls,
+            'send_seconds': round(send_seconds, 3),
+            'send_rpcs': dict(counter.calls),
+        }, indent=2, sort_keys=True))
+    finally:
+        bed.deactivate()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+
+"""Cost of reading a user's registrations, by how they are stored.
+
+Compares decoding N registrations (1000 by default) stored as:
+
+* websafe strings in the legacy `Profile.conferenceKeysToAttend`, each
+  parsed back into a key with `ndb.Key(urlsafe=...)`,
+* a repeated `KeyProperty` (as `Profile.sessions_wishlist` is stored),
+* `Registration` entities, as returned by the ancestor query in
+  `registrations.get_conference_keys`.
+
+Usage: python benchmarks/registration_decode_benchmark.py [registrations]
+"""
+
+import sys
+import timeit
+
+import common
+common.setup_paths()
+
+from google.appengine.datastore import entity_pb
+from google.appengine.ext import ndb
+
+import registrations
+from models import Conference
+from models import Profile
+
+
+class KeyListProfile(ndb.Model):
+
+    """A profile keeping its registrations in a repeated KeyProperty."""
+
+    conferenceKeysToAttend = ndb.KeyProperty(kind='Conference', repeated=True)
+
+
+ADAPTER = ndb.ModelAdapter()
+
+
+def encode(entity):
+    """Serialize an entity as the datastore returns it."""
+    return ADAPTER.entity_to_pb(entity).Encode()
+
+
+def decode(data):
+    """Deserialize an entity returned by the datastore."""
+    return ADAPTER.pb_to_entity(entity_pb.EntityProto(data))
+
+
+def make_stored(count):
+    """Build the serialized forms of `count` registrations of one user."""
+    profile_key = ndb.Key(Profile, 'attendee')
+    conference_keys = [ndb.Key(Profile, 'user%d' % i, Conference, i + 1)
+                       for i in range(count)]
+    return {
+        'strings': encode(Profile(
+            key=profile_key,
+            conferenceKeysToAttend=[key.urlsafe() for key in conference_keys])),
+        'keys': encode(KeyListProfile(
+            key=ndb.Key(KeyListProfile, 'attendee'),
+            conferenceKeysToAttend=conference_keys)),
+        'entities': [encode(registrations.new_registration(profile_key, key))
+                     for key in conference_keys],
+    }
+
+
+def read_strings(stored):
+    """Read conference keys stored as websafe strings."""
+    return [ndb.Key(urlsafe=wsck) for
+            wsck in decode(stored['strings']).conferenceKeysToAttend]
+
+
+def read_keys(stored):
+    """Read conference keys stored in a repeated KeyProperty."""
+    return list(decode(stored['keys']).conferenceKeysToAttend)
+
+
+def read_entities(stored):
+    """Read conference keys from Registration entities."""
+    return [decode(data).conference for data in stored['entities']]
+
+
+def per_item_us(function, stored, count):
+    """Best-of-3 time to read one registration, in microseconds."""
+    seconds = min(timeit.repeat(
+        lambda: function(stored), number=1, repeat=3))
+    return seconds / count * 1e6
+
+
+def main(count):
+    stored = make_stored(count)
+    rows = [
+        ('websafe strings', read_strings, len(stored['strings'])),
+        ('KeyProperty', read_keys, len(stored['keys'])),
+        ('Registration', read_entities,
+         sum(len(data) for data in stored['entities'])),
+    ]
+    print('%d registrations of one user' % count)
+    print('%-16s %14s %16s' % ('stored as', 'us/registration',
+                               'bytes/registration'))
+    for name, read, size in rows:
+        assert len(read(stored)) == count
+        print('%-16s %14.2f %16.1f' % (
+            name, per_item_us(read, stored, count), float(size) / count))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
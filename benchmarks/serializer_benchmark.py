@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+
+"""Per-item cost of the entity serializers before and after precompiling.
+
+Conferences and profiles were copied field by field with reflection, and
+sessions (including their date, time and speaker key fields) and speakers
+by hand-written constructors.
+
+Usage: python benchmarks/serializer_benchmark.py [entities]
+"""
+
+import datetime
+import sys
+import timeit
+
+import common
+common.setup_paths()
+
+from google.appengine.ext import ndb
+
+import serializers
+from models import Conference
+from models import ConferenceForm
+from models import Profile
+from models import ProfileForm
+from models import Session
+from models import SessionResponseMessage
+from models import Speaker
+from models import SpeakerResponseMessage
+from models import TeeShirtSize
+
+
+def reflective_conference_form(conf):
+    """The per-field reflective copy serializers.py replaced."""
+    cf = ConferenceForm()
+    for field in cf.all_fields():
+        if hasattr(conf, field.name):
+            if field.name.endswith('Date'):
+                setattr(cf, field.name, str(getattr(conf, field.name)))
+            else:
+                setattr(cf, field.name, getattr(conf, field.name))
+        elif field.name == "websafeKey":
+            setattr(cf, field.name, conf.key.urlsafe())
+    cf.check_initialized()
+    return cf
+
+
+def reflective_profile_form(prof):
+    """The per-field reflective copy serializers.py replaced."""
+    pf = ProfileForm()
+    for field in pf.all_fields():
+        if hasattr(prof, field.name):
+            if field.name == 'teeShirtSize':
+                setattr(pf, field.name,
+                        getattr(TeeShirtSize, getattr(prof, field.name)))
+            else:
+                setattr(pf, field.name, getattr(prof, field.name))
+    pf.check_initialized()
+    return pf
+
+
+def hand_written_speaker_message(speaker):
+    """The hand-written Speaker.to_message serializers.py replaced."""
+    return SpeakerResponseMessage(id=speaker.key.urlsafe(), name=speaker.name)
+
+
+def hand_written_session_message(session, speaker_message):
+    """The hand-written Session.to_message serializers.py replaced."""
+    return SessionResponseMessage(
+        id=session.key.urlsafe(), name=session.name,
+        highlights=session.highlights, speaker=speaker_message,
+        duration=(str(session.duration) if session.duration is not None
+                  else None),
+        type_of_session=session.type_of_session, date=str(session.date),
+        start_time=str(session.start_time))
+
+
+def make_entities(count):
+    """Build (unsaved) conferences, profiles, speakers and sessions."""
+    start = datetime.date(2016, 1, 1)
+    conferences = [
+        Conference(key=ndb.Key(Profile, 'user%d' % i, Conference, i + 1),
+                   name='Conference %d' % i, description='Description',
+                   organizerUserId='user%d' % i, topics=['Python', 'Cloud'],
+                   city='London', startDate=start, month=1, endDate=start,
+                   maxAttendees=100, seatsAvailable=50,
+                   organizerDisplayName='User %d' % i)
+        for i in range(count)]
+    profiles = [
+        Profile(key=ndb.Key(Profile, 'user%d' % i), displayName='User %d' % i,
+                mainEmail='user%d@example.com' % i, teeShirtSize='M_M',
+                conferenceKeysToAttend=['key1', 'key2'])
+        for i in range(count)]
+    speakers = [Speaker(key=ndb.Key(Speaker, i + 1), name='Speaker %d' % i)
+                for i in range(count)]
+    sessions = [
+        Session(key=ndb.Key(Profile, 'user%d' % i, Conference, i + 1,
+                            Session, i + 1),
+                name='Session %d' % i, highlights='Highlights',
+                speaker_key=speakers[i].key, duration=60,
+                type_of_session='talk', date=start,
+                start_time=datetime.time(9 + i % 10, 30))
+        for i in range(count)]
+    return conferences, profiles, speakers, sessions
+
+
+def per_item_us(function, entities):
+    """Best-of-3 time to serialize one entity, in microseconds."""
+    seconds = min(timeit.repeat(
+        lambda: [function(entity) for entity in entities], number=1, repeat=3))
+    return seconds / len(entities) * 1e6
+
+
+def main(count):
+    conferences, profiles, speakers, sessions = make_entities(count)
+    # Speakers are serialized separately (and once per listing)
+    speaker_message = hand_written_speaker_message(speakers[0])
+    rows = [
+        ('Conference', reflective_conference_form,
+         lambda conf: serializers.serialize(conf, ConferenceForm),
+         conferences),
+        ('Profile', reflective_profile_form,
+         lambda prof: serializers.serialize(prof, ProfileForm), profiles),
+        ('Speaker', hand_written_speaker_message,
+         lambda speaker: serializers.serialize(
+             speaker, SpeakerResponseMessage), speakers),
+        ('Session',
+         lambda session: hand_written_session_message(
+             session, speaker_message),
+         lambda session: serializers.serialize(
+             session, SessionResponseMessage, speaker=speaker_message),
+         sessions),
+    ]
+    print('%d entities, per-item cost in microseconds' % count)
+    print('%-12s %12s %12s %8s' % ('model', 'before', 'precompiled',
+                                   'speedup'))
+    for name, before, after, entities in rows:
+        before_us = per_item_us(before, entities)
+        after_us = per_item_us(after, entities)
+        print('%-12s %12.2f %12.2f %7.2fx' % (
+            name, before_us, after_us, before_us / after_us))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+
+"""Import time of the WSGI applications, as paid by loading requests.
+
+Imports `main.app` (task, cron & admin handlers) and `conference.api` (the
+Endpoints service) each in fresh interpreters, N times (5 by default, after
+one run to compile bytecode), and prints a JSON report of the median import
+time and of the modules loaded. Exits with status 1 if an import is over
+its budget in `BUDGET_SECONDS`, or if `main.app` loads any of the modules
+in `NOT_FOR_MAIN` that only some of its handlers need.
+
+Usage: python benchmarks/startup_benchmark.py [--repeat N]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import common
+
+TARGETS = (('main', 'app'), ('conference', 'api'))
+BUDGET_SECONDS = {
+    'main.app': 1.0,
+    'conference.api': 3.0,
+}
+NOT_FOR_MAIN = ('conference', 'resource_containers', 'bulk_import',
+                'conference_search', 'endpoints',
+                'google.appengine.api.search')
+
+
+def child(module_name, attribute):
+    """Import `module_name.attribute` and print the time and modules taken."""
+    common.setup_paths()
+    before = set(sys.modules)
+    start = time.time()
+    getattr(__import__(module_name), attribute)
+    seconds = time.time() - start
+    loaded = [name for name in set(sys.modules) - before if
+              sys.modules[name] is not None]
+    print(json.dumps({'seconds': seconds, 'modules': sorted(loaded)}))
+
+
+def measure(module_name, attribute, repeat):
+    """Import a target in `repeat` fresh interpreters; returns the runs."""
+    runs = []
+    for _ in range(repeat + 1):
+        output = subprocess.check_output([
+            sys.executable, os.path.abspath(__file__), '--child',
+            module_name, attribute])
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    # The first run may have compiled the bytecode
+    return runs[1:]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='imports per target')
+    parser.add_argument('--child', nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(*args.child)
+        return 0
+
+    report = {}
+    failures = []
+    for module_name, attribute in TARGETS:
+        target = '{0}.{1}'.format(module_name, attribute)
+        runs = measure(module_name, attribute, args.repeat)
+        seconds = sorted(run['seconds'] for run in runs)[len(runs) // 2]
+        modules = runs[-1]['modules']
+        report[target] = {
+            'median_ms': round(seconds * 1000, 3),
+            'budget_ms': BUDGET_SECONDS[target] * 1000,
+            'modules_loaded': len(modules),
+        }
+        if seconds > BUDGET_SECONDS[target]:
+            failures.append('{0} took {1:.3f}s'.format(target, seconds))
+        if module_name == 'main':
+            heavy = sorted(set(NOT_FOR_MAIN) & set(modules))
+            report[target]['heavy_modules_loaded'] = heavy
+            if heavy:
+                failures.append('{0} loaded {1}'.format(
+                    target, ', '.join(heavy)))
+
+    report['failures'] = failures
+    print(json.dumps(report, indent=2, sort_keys=True))
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
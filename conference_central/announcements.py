@@ -0,0 +1,210 @@
+"""The "nearly sold out" announcement for Conference Central.
+
+The conferences with `MIN_SEATS` to `MAX_SEATS` seats left are kept in a
+single `NearlySoldOut` entity, and the announcement made from them in
+memcache. `seat_counter` calls `seats_changed` once a registration commits,
+and creating or updating a conference calls `update`; when a conference may
+have moved into or out of that window, they queue it to be checked. The
+checks are applied by one task per `UPDATE_INTERVAL`, so the single entity
+is written at most that often, never inside a user's transaction, however
+many registrations there are. A check can still be lost (the instance may
+die before queueing it) or work from a stale cached total, so the hourly
+cron `reconcile`s the conferences already listed and those whose seats
+changed within `RECONCILE_HOURS`, at most `MAX_RECONCILED` of them (the
+most recently changed first). Its cost doesn't grow with the number of
+conferences; a conference missed on a busier day is listed when its seats
+next change.
+"""
+import time
+
+from google.appengine.api import memcache
+from google.appengine.api import taskqueue
+from google.appengine.ext import ndb
+
+from models import NearlySoldOut
+
+MEMCACHE_ANNOUNCEMENTS_KEY = "RECENT_ANNOUNCEMENTS"
+ANNOUNCEMENT_TPL = ('Last chance to attend! The following conferences '
+                    'are nearly sold out: %s')
+MIN_SEATS = 1
+MAX_SEATS = 5
+# Twice the cron's interval, so one failed run misses nothing
+RECONCILE_HOURS = 2
+MAX_RECONCILED = 500
+QUEUE_NAME = 'announcement'
+UPDATE_INTERVAL = 5  # seconds
+# Checks applied (and pull tasks added) per call
+BATCH_SIZE = 100
+LEASE_SECONDS = 60
+
+
+def _key():
+    """Get the key of the (only) NearlySoldOut entity."""
+    return ndb.Key(NearlySoldOut, 'nearly_sold_out')
+
+
+def _format(names):
+    """Make the announcement for conference names (by url-safe key)."""
+    if not names:
+        return ""
+    return ANNOUNCEMENT_TPL % ', '.join(sorted(names.values()))
+
+
+def _cache(names):
+    """Set the cached announcement ("" when there's none to make)."""
+    memcache.set(MEMCACHE_ANNOUNCEMENTS_KEY, _format(names))
+
+
+def is_nearly_sold_out(seats):
+    """Check whether a number of available seats is in the window."""
+    return seats is not None and MIN_SEATS <= seats <= MAX_SEATS
+
+
+@ndb.transactional
+def _apply(changes, force_cache=False):
+    """Apply {url-safe key: name, or None to remove} to the listed names.
+
+    Only writes (and recaches) if a name was added, removed or renamed.
+    Returns the names.
+    """
+    entity = _key().get() or NearlySoldOut(key=_key(), names={})
+    names = dict(entity.names or {})
+    for wsck, name in changes.items():
+        if name is None:
+            names.pop(wsck, None)
+        else:
+            names[wsck] = name
+
+    if names != (entity.names or {}):
+        entity.names = names
+        entity.put()
+    elif not force_cache:
+        return names
+    # Outside a transaction the callback runs immediately
+    ndb.get_context().call_on_commit(lambda: _cache(names))
+    return names
+
+
+def _changes(conferences, seats):
+    """Get the changes listing or unlisting conferences by their seats."""
+    return dict(
+        (conference.key.urlsafe(),
+         conference.name if is_nearly_sold_out(seats_available) else None)
+        for conference, seats_available in zip(conferences, seats))
+
+
+def schedule_check(conference_keys):
+    """Check conferences against their seats soon, once committed.
+
+    Checks queued during an interval are applied together by one task.
+    """
+    if not conference_keys:
+        return
+    payloads = [conference_key.urlsafe() for
+                conference_key in conference_keys]
+
+    def add():
+        queue = taskqueue.Queue(QUEUE_NAME)
+        for i in range(0, len(payloads), BATCH_SIZE):
+            queue.add([taskqueue.Task(payload=payload, method='PULL') for
+                       payload in payloads[i:i + BATCH_SIZE]])
+
+        # One update per interval; it runs after the interval ends so no
+        # check queued during the interval can be missed
+        bucket = int(time.time()) // UPDATE_INTERVAL
+        try:
+            taskqueue.add(
+                name='announcement-{0}'.format(bucket),
+                countdown=max(0, (bucket + 1) * UPDATE_INTERVAL - time.time()),
+                url='/tasks/update_announcement')
+        except (taskqueue.TaskAlreadyExistsError,
+                taskqueue.TombstonedTaskError):
+            pass
+
+    # Outside a transaction the callback runs immediately
+    ndb.get_context().call_on_commit(add)
+
+
+def update(conferences, seats):
+    """List or unlist conferences by their numbers of available seats, soon.
+
+    Only conferences in the window, or listed already, are checked.
+    """
+    listed = set(get_conference_keys())
+    schedule_check([conference.key for conference, seats_available in
+                    zip(conferences, seats) if
+                    is_nearly_sold_out(seats_available) or
+                    conference.key in listed])
+
+
+def seats_changed(conference, seats, delta):
+    """Check a conference soon if its seats moved into or out of the window."""
+    if is_nearly_sold_out(seats) != is_nearly_sold_out(seats - delta):
+        schedule_check([conference.key])
+
+
+def process():
+    """Apply the queued checks to the listing, a batch at a time.
+
+    Returns the number of checks applied.
+    """
+    # seat_counter imports this module
+    import seat_counter
+    queue = taskqueue.Queue(QUEUE_NAME)
+    processed = 0
+    while True:
+        tasks = queue.lease_tasks(LEASE_SECONDS, BATCH_SIZE)
+        if not tasks:
+            return processed
+
+        try:
+            conference_keys = list(set(
+                ndb.Key(urlsafe=task.payload) for task in tasks))
+            conferences = ndb.get_multi(conference_keys)
+            # Deleted conferences are unlisted
+            changes = dict((conference_key.urlsafe(), None) for
+                           conference_key, conference in
+                           zip(conference_keys, conferences) if not conference)
+            conferences = [conference for conference in conferences if
+                           conference]
+            changes.update(_changes(
+                conferences, seat_counter.get_counts(conferences)))
+            _apply(changes)
+        except Exception:
+            # Nothing was applied; give the leases back so that the retry
+            # of this (push) task can lease the batch again
+            for task in tasks:
+                queue.modify_task_lease(task, 0)
+            raise
+        queue.delete_tasks(tasks)
+        processed += len(tasks)
+
+
+@ndb.non_transactional
+def get_conference_keys():
+    """Get the keys of the listed conferences."""
+    entity = _key().get()
+    return [ndb.Key(urlsafe=wsck) for wsck in (entity.names if entity else {})]
+
+
+def reconcile(conferences, seats):
+    """Check conferences against their seats and recache.
+
+    `conferences` are those (still existing) of `get_conference_keys`, and
+    any others to check; listed conferences that aren't among them are
+    dropped. Returns the announcement.
+    """
+    changes = dict((conference_key.urlsafe(), None) for
+                   conference_key in get_conference_keys())
+    changes.update(_changes(conferences, seats))
+    return _format(_apply(changes, force_cache=True))
+
+
+def get_announcement():
+    """Get the announcement, from memcache if possible."""
+    announcement = memcache.get(MEMCACHE_ANNOUNCEMENTS_KEY)
+    if announcement is None:
+        entity = _key().get()
+        announcement = _format(entity.names if entity else {})
+        memcache.add(MEMCACHE_ANNOUNCEMENTS_KEY, announcement)
+    return announcement
@@ -0,0 +1,150 @@
+"""Bulk creation of speakers and sessions for Conference Central.
+
+Used by the bulk endpoints in conference.py and by the offline import
+handler in main.py. A whole batch is validated before anything is written,
+entity IDs are allocated in one call and entities are written with
+`ndb.put_multi`, `PUT_BATCH_SIZE` at a time.
+"""
+
+from datetime import datetime
+
+import endpoints
+from google.appengine.ext import ndb
+
+import conference_search
+import featured_speakers
+from models import Session
+from models import Speaker
+import schedules
+import session_queries
+
+PUT_BATCH_SIZE = 500
+
+
+def put_in_batches(entities):
+    """Store `entities` with put_multi, PUT_BATCH_SIZE at a time."""
+    for i in range(0, len(entities), PUT_BATCH_SIZE):
+        ndb.put_multi(entities[i:i + PUT_BATCH_SIZE])
+
+
+def _check(errors):
+    """Raise a bad request listing `errors`, if there are any."""
+    if errors:
+        raise endpoints.BadRequestException(' '.join(errors))
+
+
+def create_speakers(names):
+    """Create a speaker for each of `names`, returning the speakers."""
+    _check(["Speaker {0}: 'name' is required.".format(i) for
+            i, name in enumerate(names) if not name])
+
+    speakers = [Speaker(name=name) for name in names]
+    put_in_batches(speakers)
+    return speakers
+
+
+def _get_speakers(urlsafe_keys):
+    """Get speakers by (distinct) url-safe key, None for any not found."""
+    urlsafe_keys = set(urlsafe_keys)
+    keys = {}
+    for urlsafe_key in urlsafe_keys:
+        try:
+            key = ndb.Key(urlsafe=urlsafe_key)
+        except Exception:
+            # All kinds of errors can happen with user-provided keys
+            continue
+        if key.kind() == Speaker._get_kind():
+            keys[urlsafe_key] = key
+
+    speakers = dict(zip(keys, ndb.get_multi(keys.values())))
+    return dict((urlsafe_key, speakers.get(urlsafe_key)) for
+                urlsafe_key in urlsafe_keys)
+
+
+def create_sessions(conference, sessions_fields, new_speakers=()):
+    """Create sessions for `conference`, returning the sessions.
+
+    Each item of `sessions_fields` is a dict of `SessionRequestMessage`
+    field names to (string) values. `new_speakers` are (unsaved) speakers
+    that sessions may refer to; they are stored along with the sessions.
+    The featured speaker is updated once for the whole batch.
+    """
+    if not sessions_fields:
+        return []
+
+    speakers = _get_speakers(fields.get('speaker_key') for
+                             fields in sessions_fields if fields.get('speaker_key'))
+    speakers.update((speaker.key.urlsafe(), speaker) for speaker in new_speakers)
+
+    errors = []
+    properties = []
+    for i, fields in enumerate(sessions_fields):
+        missing = [required for required in (
+            'name', 'speaker_key', 'type_of_session', 'date', 'start_time')
+            if not fields.get(required)]
+        if missing:
+            errors.append("Session {0}: '{1}' is required.".format(
+                i, "', '".join(missing)))
+            continue
+        try:
+            date = datetime.strptime(fields['date'], "%Y-%m-%d").date()
+            start_time = datetime.strptime(fields['start_time'], '%H:%M').time()
+            duration = (int(fields['duration']) if fields.get('duration')
+                        else None)
+        except (TypeError, ValueError):
+            errors.append(
+                "Session {0}: date must be in format YYYY-MM-DD, time in "
+                "format HH:MM (24 hour clock) and duration a number.".format(i))
+            continue
+        speaker = speakers[fields['speaker_key']]
+        if not speaker:
+            errors.append("Session {0}: no speaker found with key: {1}.".format(
+                i, fields['speaker_key']))
+            continue
+
+        properties.append(dict(
+            name=fields['name'], highlights=fields.get('highlights'),
+            speaker_key=speaker.key, duration=duration,
+            type_of_session=fields['type_of_session'], date=date,
+            start_time=start_time))
+    _check(errors)
+
+    first_id, last_id = Session.allocate_ids(
+        size=len(properties), parent=conference.key)
+    sessions = [Session(key=ndb.Key(Session, session_id, parent=conference.key),
+                        **session_properties) for session_id, session_properties
+                in zip(range(first_id, last_id + 1), properties)]
+    put_in_batches(list(new_speakers))
+    schedules.put_sessions(conference.key, sessions)
+
+    for type_of_session in set(session.type_of_session for session in sessions):
+        session_queries.register_session_type(type_of_session)
+
+    featured_speakers.schedule_update(conference.key)
+    conference_search.schedule_index([conference.key])
+
+    return sessions
+
+
+def import_sessions(conference, rows):
+    """Create sessions (and speakers) for `conference` from imported rows.
+
+    Rows are dicts like `create_sessions` takes, except that a row may name
+    its speaker (`speaker`) instead of giving `speaker_key`; one speaker is
+    created per distinct name.
+    """
+    names = sorted(set(row['speaker'] for row in rows if
+                       row.get('speaker') and not row.get('speaker_key')))
+    new_speakers = []
+    if names:
+        first_id, last_id = Speaker.allocate_ids(size=len(names))
+        new_speakers = [Speaker(key=ndb.Key(Speaker, speaker_id), name=name)
+                        for speaker_id, name in
+                        zip(range(first_id, last_id + 1), names)]
+    speaker_keys = dict((speaker.name, speaker.key.urlsafe()) for
+                        speaker in new_speakers)
+
+    sessions_fields = [
+        dict(row, speaker_key=row.get('speaker_key') or
+             speaker_keys.get(row.get('speaker'))) for row in rows]
+    return create_sessions(conference, sessions_fields, new_speakers)
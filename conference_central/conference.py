@@ -14,6 +14,7 @@ __author__ = 'wesc+api@google.com (Wesley Chun)'
 
 
 from datetime import datetime
+import httplib
 import logging
 
 import endpoints
@@ -22,9 +23,9 @@ from protorpc import remote
 
 from google.appengine.api import memcache
 from google.appengine.api import taskqueue
+from google.appengine.datastore.datastore_query import Cursor
 from google.appengine.ext import ndb
 
-from models import ConflictException
 from models import Profile
 from models import ProfileMiniForm
 from models import ProfileForm
@@ -41,8 +42,32 @@ from models import SessionsResponseMessage
 from models import Speaker
 from models import SpeakerRequestMessage
 from models import SpeakerResponseMessage
-
+from models import SpeakersRequestMessage
+from models import SpeakersResponseMessage
+from models import RegistrationTicket
+from models import RegistrationTicketMessage
+from models import AttendeesResponseMessage
+from models import ConferenceFeed
+from models import ConferenceFeedRequestMessage
+from models import ConferenceFeedResponseMessage
+
+import announcements
+import bulk_import
+import conference_feeds
+import conference_queries
+import conference_search
+import entity_cache
+import featured_speakers
+from featured_speakers import MEMCACHE_FEATURED_SPEAKER
+import mail_queue
+import profile_cache
+import registration_queue
+import registrations
 import resource_containers as containers
+import schedules
+import seat_counter
+import session_queries
+import serializers
 
 from settings import WEB_CLIENT_ID
 from settings import ANDROID_CLIENT_ID
@@ -51,12 +76,16 @@ from settings import ANDROID_AUDIENCE
 
 from utils import getUserId
 
+from instrumentation import instrumented
+
+# defined here rather than in models.py, which task handlers import
+# without (the costly) endpoints
+class ConflictException(endpoints.ServiceException):
+    """ConflictException -- exception mapped to HTTP 409 response"""
+    http_status = httplib.CONFLICT
+
 EMAIL_SCOPE = endpoints.EMAIL_SCOPE
 API_EXPLORER_CLIENT_ID = endpoints.API_EXPLORER_CLIENT_ID
-MEMCACHE_ANNOUNCEMENTS_KEY = "RECENT_ANNOUNCEMENTS"
-MEMCACHE_FEATURED_SPEAKER = "FEATURED_SPEAKER"
-ANNOUNCEMENT_TPL = ('Last chance to attend! The following conferences '
-                    'are nearly sold out: %s')
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
 
 DEFAULTS = {
@@ -82,6 +111,9 @@ FIELDS =    {
             'MAX_ATTENDEES': 'maxAttendees',
             }
 
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
 INTERACTIVE_SESSION_TYPES = ('workshop', 'hackathon', 'lab')
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
 
@@ -94,39 +126,84 @@ class ConferenceApi(remote.Service):
 
 # - - - Conference objects - - - - - - - - - - - - - - - - -
 
-    def _copyConferenceToForm(self, conf, displayName):
+    def _copyConferenceToForm(self, conf, displayName=None, seatsAvailable=None):
         """Copy relevant fields from Conference to ConferenceForm."""
-        cf = ConferenceForm()
-        for field in cf.all_fields():
-            if hasattr(conf, field.name):
-                # convert Date to date string; just copy others
-                if field.name.endswith('Date'):
-                    setattr(cf, field.name, str(getattr(conf, field.name)))
-                else:
-                    setattr(cf, field.name, getattr(conf, field.name))
-            elif field.name == "websafeKey":
-                setattr(cf, field.name, conf.key.urlsafe())
+        overrides = {}
+        # organizerDisplayName is stored on Conference; only override it
         if displayName:
-            setattr(cf, 'organizerDisplayName', displayName)
-        cf.check_initialized()
-        return cf
+            overrides['organizerDisplayName'] = displayName
+        # seats are kept by seat_counter; Conference only has the initial count
+        if seatsAvailable is not None:
+            overrides['seatsAvailable'] = seatsAvailable
+        return serializers.serialize(conf, ConferenceForm, **overrides)
 
 
     def _createConferenceObject(self, request):
         """Create or update Conference object, returning ConferenceForm/request."""
+        return self._createConferenceObjects([request])[0]
+
+
+    def _createConferenceObjects(self, requests):
+        """Create Conference objects, returning ConferenceForms/requests.
+
+        Every request is checked before any Conference is created.
+        """
         # preload necessary data items
         user = endpoints.get_current_user()
         if not user:
             raise endpoints.UnauthorizedException('Authorization required')
         user_id = getUserId(user)
 
-        if not request.name:
-            raise endpoints.BadRequestException("Conference 'name' field required")
+        for request in requests:
+            if not request.name:
+                raise endpoints.BadRequestException("Conference 'name' field required")
+        try:
+            conferences_data = [self._conferenceDataFromForm(request) for request in requests]
+        except ValueError:
+            raise endpoints.BadRequestException(
+                "Conference dates must be in format YYYY-MM-DD.")
+
+        # organiser name is stored on the Conference to spare listing lookups
+        prof = self._getProfileFromUser()
 
+        # generate Profile Key based on user ID and Conference
+        # IDs (in one allocation) based on Profile key get Conference keys
+        p_key = ndb.Key(Profile, user_id)
+        first_id, last_id = Conference.allocate_ids(size=len(requests), parent=p_key)
+        conferences = []
+        for c_id, request, data in zip(
+                range(first_id, last_id + 1), requests, conferences_data):
+            c_key = ndb.Key(Conference, c_id, parent=p_key)
+            data['key'] = c_key
+            data['organizerUserId'] = request.organizerUserId = user_id
+            data['organizerDisplayName'] = request.organizerDisplayName = prof.displayName
+            request.websafeKey = c_key.urlsafe()
+            conferences.append(Conference(**data))
+
+        # create Conferences, queue (one) email to organizer confirming
+        # creation of Conferences & return (modified) ConferenceForms
+        bulk_import.put_in_batches(conferences)
+        seat_counter.reset_multi(
+            dict((conf.key, conf.seatsAvailable) for conf in conferences))
+        announcements.update(
+            conferences, [conf.seatsAvailable for conf in conferences])
+        conference_search.schedule_index([conf.key for conf in conferences])
+        conference_feeds.bump_generation()
+        # the email is queued & sent in a batch (see mail_queue.py)
+        mail_queue.enqueue('conference_created', user.email(), [{
+            'name': conf.name,
+            'city': conf.city or '',
+            'startDate': conf.startDate.isoformat() if conf.startDate else '',
+            'endDate': conf.endDate.isoformat() if conf.endDate else '',
+        } for conf in conferences])
+        return requests
+
+
+    def _conferenceDataFromForm(self, request):
+        """Copy ConferenceForm into a dict of Conference properties."""
         # copy ConferenceForm/ProtoRPC Message into dict
         data = {field.name: getattr(request, field.name) for field in request.all_fields()}
         del data['websafeKey']
-        del data['organizerDisplayName']
 
         # add default values for those missing (both data model & outbound Message)
         for df in DEFAULTS:
@@ -146,25 +223,10 @@ class ConferenceApi(remote.Service):
         # set seatsAvailable to be same as maxAttendees on creation
         if data["maxAttendees"] > 0:
             data["seatsAvailable"] = data["maxAttendees"]
-        # generate Profile Key based on user ID and Conference
-        # ID based on Profile key get Conference key from ID
-        p_key = ndb.Key(Profile, user_id)
-        c_id = Conference.allocate_ids(size=1, parent=p_key)[0]
-        c_key = ndb.Key(Conference, c_id, parent=p_key)
-        data['key'] = c_key
-        data['organizerUserId'] = request.organizerUserId = user_id
-
-        # create Conference, send email to organizer confirming
-        # creation of Conference & return (modified) ConferenceForm
-        Conference(**data).put()
-        taskqueue.add(params={'email': user.email(),
-            'conferenceInfo': repr(request)},
-            url='/tasks/send_confirmation_email'
-        )
-        return request
+        return data
 
 
-    @ndb.transactional()
+    @ndb.transactional(xg=True)
     def _updateConferenceObject(self, request):
         user = endpoints.get_current_user()
         if not user:
@@ -189,6 +251,9 @@ class ConferenceApi(remote.Service):
         # Not getting all the fields, so don't create a new object; just
         # copy relevant fields from ConferenceForm to Conference object
         for field in request.all_fields():
+            # organizerDisplayName is kept in sync with the organiser's Profile
+            if field.name == 'organizerDisplayName':
+                continue
             data = getattr(request, field.name)
             # only copy fields where we get data
             if data not in (None, []):
@@ -200,20 +265,42 @@ class ConferenceApi(remote.Service):
                 # write to Conference object
                 setattr(conf, field.name, data)
         conf.put()
-        prof = ndb.Key(Profile, user_id).get()
-        return self._copyConferenceToForm(conf, getattr(prof, 'displayName'))
+        if request.seatsAvailable is not None:
+            seat_counter.reset(conf.key, conf.seatsAvailable)
+            seats = conf.seatsAvailable
+        else:
+            seats = seat_counter.get_counts([conf])[0]
+        # the name or the seats may have changed
+        announcements.update([conf], [seats])
+        entity_cache.bump_version(conf.key)
+        conference_feeds.bump_generation()
+        conference_search.schedule_index([conf.key])
+        return self._copyConferenceToForm(conf, seatsAvailable=seats)
 
 
     @endpoints.method(ConferenceForm, ConferenceForm, path='conference',
             http_method='POST', name='createConference')
+    @instrumented
     def createConference(self, request):
         """Create new conference."""
         return self._createConferenceObject(request)
 
 
+    @endpoints.method(ConferenceForms, ConferenceForms, path='conferences',
+            http_method='POST', name='createConferences')
+    @instrumented
+    def createConferences(self, request):
+        """Create new conferences in bulk."""
+        if not request.items:
+            return ConferenceForms()
+        return ConferenceForms(
+            items=self._createConferenceObjects(request.items))
+
+
     @endpoints.method(containers.CONF_POST_REQUEST, ConferenceForm,
             path='conference/{websafeConferenceKey}',
             http_method='PUT', name='updateConference')
+    @instrumented
     def updateConference(self, request):
         """Update conference w/provided fields & return w/updated info."""
         return self._updateConferenceObject(request)
@@ -222,21 +309,25 @@ class ConferenceApi(remote.Service):
     @endpoints.method(containers.CONF_GET_REQUEST, ConferenceForm,
             path='conference/{websafeConferenceKey}',
             http_method='GET', name='getConference')
+    @instrumented
     def getConference(self, request):
         """Return requested conference (by websafeConferenceKey)."""
-        # get Conference object from request; bail if not found
-        conf = ndb.Key(urlsafe=request.websafeConferenceKey).get()
+        c_key = ndb.Key(urlsafe=request.websafeConferenceKey)
+
+        # get Conference object (usually from memcache); bail if not found
+        conf = entity_cache.get_multi([c_key])[0]
         if not conf:
             raise endpoints.NotFoundException(
                 'No conference found with key: %s' % request.websafeConferenceKey)
-        prof = conf.key.parent().get()
         # return ConferenceForm
-        return self._copyConferenceToForm(conf, getattr(prof, 'displayName'))
+        return self._copyConferenceToForm(
+            conf, seatsAvailable=seat_counter.get_counts([conf])[0])
 
 
     @endpoints.method(message_types.VoidMessage, ConferenceForms,
             path='getConferencesCreated',
             http_method='POST', name='getConferencesCreated')
+    @instrumented
     def getConferencesCreated(self, request):
         """Return conferences created by user."""
         # make sure user is authed
@@ -245,39 +336,53 @@ class ConferenceApi(remote.Service):
             raise endpoints.UnauthorizedException('Authorization required')
         user_id = getUserId(user)
 
-        # create ancestor query for all key matches for this user
-        confs = Conference.query(ancestor=ndb.Key(Profile, user_id))
-        prof = ndb.Key(Profile, user_id).get()
+        # create ancestor keys-only query for this user; the conferences
+        # themselves usually come from memcache
+        confs = entity_cache.get_multi(Conference.query(
+            ancestor=ndb.Key(Profile, user_id)).fetch(keys_only=True))
+        seats = seat_counter.get_counts(confs)
         # return set of ConferenceForm objects per Conference
         return ConferenceForms(
-            items=[self._copyConferenceToForm(conf, getattr(prof, 'displayName')) for conf in confs]
+            items=[self._copyConferenceToForm(conf, seatsAvailable=seats_available)
+                   for conf, seats_available in zip(confs, seats)]
         )
 
 
     def _getQuery(self, request):
-        """Return formatted query from the submitted filters."""
-        q = Conference.query()
-        inequality_filter, filters = self._formatFilters(request.filters)
-
-        # If exists, sort on inequality filter first
-        if not inequality_filter:
-            q = q.order(Conference.name)
-        else:
-            q = q.order(ndb.GenericProperty(inequality_filter))
-            q = q.order(Conference.name)
-
-        for filtr in filters:
+        """Return a query plan for the submitted filters (see conference_queries)."""
+        filters = []
+        for filtr in self._formatFilters(request.filters):
             if filtr["field"] in ["month", "maxAttendees"]:
                 filtr["value"] = int(filtr["value"])
-            formatted_query = ndb.query.FilterNode(filtr["field"], filtr["operator"], filtr["value"])
-            q = q.filter(formatted_query)
-        return q
+            filters.append((filtr["field"], filtr["operator"], filtr["value"]))
+        plan = conference_queries.plan_conferences_query(filters)
+        logging.debug('queryConferences plan: %s', plan)
+        return plan
+
+
+    def _fetchPage(self, query, page_size, page_token):
+        """Fetch one page of query (or query plan) results.
+
+        Returns (results, nextPageToken).
+        """
+        page_size = min(page_size or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+        if page_size < 1:
+            raise endpoints.BadRequestException("Page size must be positive.")
+
+        try:
+            cursor = Cursor(urlsafe=page_token) if page_token else None
+        except Exception:
+            raise endpoints.BadRequestException("Invalid page token.")
+
+        results, next_cursor, more = query.fetch_page(
+            page_size, start_cursor=cursor)
+        next_page_token = next_cursor.urlsafe() if more and next_cursor else None
+        return results, next_page_token
 
 
     def _formatFilters(self, filters):
         """Parse, check validity and format user supplied filters."""
         formatted_filters = []
-        inequality_field = None
 
         for f in filters:
             filtr = {field.name: getattr(f, field.name) for field in f.all_fields()}
@@ -288,42 +393,30 @@ class ConferenceApi(remote.Service):
             except KeyError:
                 raise endpoints.BadRequestException("Filter contains invalid field or operator.")
 
-            # Every operation except "=" is an inequality
-            if filtr["operator"] != "=":
-                # check if inequality operation has been used in previous filters
-                # disallow the filter if inequality was performed on a different field before
-                # track the field on which the inequality operation is performed
-                if inequality_field and inequality_field != filtr["field"]:
-                    raise endpoints.BadRequestException("Inequality filter is allowed on only one field.")
-                else:
-                    inequality_field = filtr["field"]
-
+            # Inequalities on several fields are fine; the query planner
+            # checks all but one field's in memory
             formatted_filters.append(filtr)
-        return (inequality_field, formatted_filters)
+        return formatted_filters
 
 
     @endpoints.method(ConferenceQueryForms, ConferenceForms,
             path='queryConferences',
             http_method='POST',
             name='queryConferences')
+    @instrumented
     def queryConferences(self, request):
         """Query for conferences."""
-        conferences = self._getQuery(request)
-
-        # need to fetch organiser displayName from profiles
-        # get all keys and use get_multi for speed
-        organisers = [(ndb.Key(Profile, conf.organizerUserId)) for conf in conferences]
-        profiles = ndb.get_multi(organisers)
-
-        # put display names in a dict for easier fetching
-        names = {}
-        for profile in profiles:
-            names[profile.key.id()] = profile.displayName
+        conferences, next_page_token = self._fetchPage(
+            self._getQuery(request), request.pageSize, request.pageToken)
 
+        # organiser displayName is stored on each Conference, so no
+        # profile lookups are needed
+        seats = seat_counter.get_counts(conferences)
         # return individual ConferenceForm object per Conference
         return ConferenceForms(
-                items=[self._copyConferenceToForm(conf, names[conf.organizerUserId]) for conf in \
-                conferences]
+                items=[self._copyConferenceToForm(conf, seatsAvailable=seats_available) \
+                for conf, seats_available in zip(conferences, seats)],
+                nextPageToken=next_page_token
         )
 
 
@@ -331,41 +424,56 @@ class ConferenceApi(remote.Service):
 
     def _copyProfileToForm(self, prof):
         """Copy relevant fields from Profile to ProfileForm."""
-        # copy relevant fields from Profile to ProfileForm
-        pf = ProfileForm()
-        for field in pf.all_fields():
-            if hasattr(prof, field.name):
-                # convert t-shirt string to Enum; just copy others
-                if field.name == 'teeShirtSize':
-                    setattr(pf, field.name, getattr(TeeShirtSize, getattr(prof, field.name)))
-                else:
-                    setattr(pf, field.name, getattr(prof, field.name))
-        pf.check_initialized()
-        return pf
+        # t-shirt string is converted to Enum; see models.py
+        return serializers.serialize(
+            prof, ProfileForm, conferenceKeysToAttend=[
+                c_key.urlsafe() for c_key in
+                self._getProfileCache().get_conference_keys(prof.key.id())])
+
+
+    def _getProfileCache(self):
+        """Return the ProfileCache of this request."""
+        # a ConferenceApi instance serves a single request
+        if not hasattr(self, '_profileCache'):
+            self._profileCache = profile_cache.ProfileCache()
+        return self._profileCache
 
 
     def _getProfileFromUser(self):
         """Return user Profile from datastore, creating new one if non-existent."""
+        return self._getProfileFromUserAsync().get_result()
+
+
+    @ndb.tasklet
+    def _getProfileFromUserAsync(self):
+        """Tasklet version of _getProfileFromUser (returns a Future)."""
         # make sure user is authed
         user = endpoints.get_current_user()
         if not user:
             raise endpoints.UnauthorizedException('Authorization required')
 
-        # get Profile from datastore
+        # get Profile from cache or datastore (see profile_cache.py)
         user_id = getUserId(user)
-        p_key = ndb.Key(Profile, user_id)
-        profile = p_key.get()
+        cache = self._getProfileCache()
+        profile = yield cache.get_profile_async(user_id)
         # create new Profile if not there
         if not profile:
             profile = Profile(
-                key = p_key,
+                key = ndb.Key(Profile, user_id),
                 displayName = user.nickname(),
                 mainEmail= user.email(),
                 teeShirtSize = str(TeeShirtSize.NOT_SPECIFIED),
             )
-            profile.put()
+            yield profile.put_async()
+            cache.set_profile(profile)
+        elif profile.conferenceKeysToAttend:
+            # move registrations kept in the legacy list of websafe
+            # strings to Registration entities (see registrations.py)
+            profile = yield registrations.migrate_profile_async(profile.key)
+            cache.set_profile(profile)
+            cache.forget_conference_keys(user_id)
 
-        return profile      # return Profile
+        raise ndb.Return(profile)      # return Profile
 
 
     def _doProfile(self, save_request=None):
@@ -379,12 +487,19 @@ class ConferenceApi(remote.Service):
                 if hasattr(save_request, field):
                     val = getattr(save_request, field)
                     if val:
+                        renamed = (field == 'displayName' and
+                                   str(val) != prof.displayName)
                         setattr(prof, field, str(val))
                         #if field == 'teeShirtSize':
                         #    setattr(prof, field, str(val).upper())
                         #else:
                         #    setattr(prof, field, val)
                         prof.put()
+                        if renamed:
+                            # copy the new name onto the user's conferences
+                            taskqueue.add(
+                                params={'user_id': prof.key.id()},
+                                url='/tasks/sync_organizer_display_name')
 
         # return ProfileForm
         return self._copyProfileToForm(prof)
@@ -392,6 +507,7 @@ class ConferenceApi(remote.Service):
 
     @endpoints.method(message_types.VoidMessage, ProfileForm,
             path='profile', http_method='GET', name='getProfile')
+    @instrumented
     def getProfile(self, request):
         """Return user profile."""
         return self._doProfile()
@@ -399,6 +515,7 @@ class ConferenceApi(remote.Service):
 
     @endpoints.method(ProfileMiniForm, ProfileForm,
             path='profile', http_method='POST', name='saveProfile')
+    @instrumented
     def saveProfile(self, request):
         """Update & return user profile."""
         return self._doProfile(request)
@@ -406,117 +523,97 @@ class ConferenceApi(remote.Service):
 
 # - - - Announcements - - - - - - - - - - - - - - - - - - - -
 
-    @staticmethod
-    def _cacheAnnouncement():
-        """Create Announcement & assign to memcache; used by
-        memcache cron job & putAnnouncement().
-        """
-        confs = Conference.query(ndb.AND(
-            Conference.seatsAvailable <= 5,
-            Conference.seatsAvailable > 0)
-        ).fetch(projection=[Conference.name])
-
-        if confs:
-            # If there are almost sold out conferences,
-            # format announcement and set it in memcache
-            announcement = ANNOUNCEMENT_TPL % (
-                ', '.join(conf.name for conf in confs))
-            memcache.set(MEMCACHE_ANNOUNCEMENTS_KEY, announcement)
-        else:
-            # If there are no sold out conferences,
-            # delete the memcache announcements entry
-            announcement = ""
-            memcache.delete(MEMCACHE_ANNOUNCEMENTS_KEY)
-
-        return announcement
-
-
     @endpoints.method(message_types.VoidMessage, StringMessage,
             path='conference/announcement/get',
             http_method='GET', name='getAnnouncement')
+    @instrumented
     def getAnnouncement(self, request):
-        """Return Announcement from memcache."""
-        return StringMessage(data=memcache.get(MEMCACHE_ANNOUNCEMENTS_KEY) or "")
+        """Return Announcement from memcache (see announcements.py)."""
+        return StringMessage(data=announcements.get_announcement())
 
 
 # - - - Registration - - - - - - - - - - - - - - - - - - - -
 
-    @ndb.transactional(xg=True)
     def _conferenceRegistration(self, request, reg=True):
         """Register or unregister user for selected conference."""
-        retval = None
+        # only the profile's key is used, so it's got (usually from
+        # cache) outside the transaction
         prof = self._getProfileFromUser() # get user Profile
+        retval = self._applyConferenceRegistration(
+            prof.key, request.websafeConferenceKey, reg)
+        self._getProfileCache().forget_conference_keys(prof.key.id())
+        return retval
+
+
+    @ndb.transactional(xg=True)
+    def _applyConferenceRegistration(self, p_key, wsck, reg):
+        """Register or unregister a user for a conference, transactionally."""
+        retval = None
 
         # check if conf exists given websafeConfKey
         # get conference; check that it exists
-        wsck = request.websafeConferenceKey
         conf = ndb.Key(urlsafe=wsck).get()
         if not conf:
             raise endpoints.NotFoundException(
                 'No conference found with key: %s' % wsck)
 
+        # registrations are keyed by profile & conference, so one get
+        # tells whether the user is registered
+        registration = registrations.registration_key(p_key, conf.key).get()
+
         # register
         if reg:
             # check if user already registered otherwise add
-            if wsck in prof.conferenceKeysToAttend:
+            if registration:
                 raise ConflictException(
                     "You have already registered for this conference")
 
-            # check if seats avail
-            if conf.seatsAvailable <= 0:
+            # check if seats avail, taking one from a random seat shard
+            # rather than writing to the (contended) conference entity
+            if not seat_counter.reserve(conf):
                 raise ConflictException(
                     "There are no seats available.")
 
-            # register user, take away one seat
-            prof.conferenceKeysToAttend.append(wsck)
-            conf.seatsAvailable -= 1
+            # register user
+            registrations.new_registration(p_key, conf.key).put()
             retval = True
 
         # unregister
         else:
             # check if user already registered
-            if wsck in prof.conferenceKeysToAttend:
+            if registration:
 
                 # unregister user, add back one seat
-                prof.conferenceKeysToAttend.remove(wsck)
-                conf.seatsAvailable += 1
+                registration.key.delete()
+                seat_counter.release(conf)
                 retval = True
             else:
                 retval = False
 
-        # write things back to the datastore & return
-        prof.put()
-        conf.put()
         return BooleanMessage(data=retval)
 
 
     @endpoints.method(message_types.VoidMessage, ConferenceForms,
             path='conferences/attending',
             http_method='GET', name='getConferencesToAttend')
+    @instrumented
     def getConferencesToAttend(self, request):
         """Get list of conferences that user has registered for."""
         prof = self._getProfileFromUser() # get user Profile
-        conf_keys = [ndb.Key(urlsafe=wsck) for wsck in prof.conferenceKeysToAttend]
-        conferences = ndb.get_multi(conf_keys)
-
-        # get organizers
-        organisers = [ndb.Key(Profile, conf.organizerUserId) for conf in conferences]
-        profiles = ndb.get_multi(organisers)
-
-        # put display names in a dict for easier fetching
-        names = {}
-        for profile in profiles:
-            names[profile.key.id()] = profile.displayName
+        conf_keys = self._getProfileCache().get_conference_keys(prof.key.id())
+        conferences = entity_cache.get_multi(conf_keys)
 
+        seats = seat_counter.get_counts(conferences)
         # return set of ConferenceForm objects per Conference
-        return ConferenceForms(items=[self._copyConferenceToForm(conf, names[conf.organizerUserId])\
-         for conf in conferences]
+        return ConferenceForms(items=[self._copyConferenceToForm(conf, seatsAvailable=seats_available)\
+         for conf, seats_available in zip(conferences, seats)]
         )
 
 
     @endpoints.method(containers.CONF_GET_REQUEST, BooleanMessage,
             path='conference/{websafeConferenceKey}',
             http_method='POST', name='registerForConference')
+    @instrumented
     def registerForConference(self, request):
         """Register user for selected conference."""
         return self._conferenceRegistration(request)
@@ -525,6 +622,7 @@ class ConferenceApi(remote.Service):
     @endpoints.method(containers.CONF_GET_REQUEST, BooleanMessage,
             path='conference/{websafeConferenceKey}',
             http_method='DELETE', name='unregisterFromConference')
+    @instrumented
     def unregisterFromConference(self, request):
         """Unregister user for selected conference."""
         return self._conferenceRegistration(request, reg=False)
@@ -533,6 +631,7 @@ class ConferenceApi(remote.Service):
     @endpoints.method(message_types.VoidMessage, ConferenceForms,
             path='filterPlayground',
             http_method='GET', name='filterPlayground')
+    @instrumented
     def filterPlayground(self, request):
         """Filter Playground"""
         q = Conference.query()
@@ -545,8 +644,11 @@ class ConferenceApi(remote.Service):
         q = q.filter(Conference.topics=="Medical Innovations")
         q = q.filter(Conference.month==6)
 
+        confs = q.fetch()
+        seats = seat_counter.get_counts(confs)
         return ConferenceForms(
-            items=[self._copyConferenceToForm(conf, "") for conf in q]
+            items=[self._copyConferenceToForm(conf, seatsAvailable=seats_available)
+                   for conf, seats_available in zip(confs, seats)]
         )
 
     # begin: brenj additions to conference.py
@@ -554,8 +656,13 @@ class ConferenceApi(remote.Service):
 
     def _get_entity_by_key(self, urlsafe_key):
         """Get an existing entity from a specified key."""
+        return self._get_entity_by_key_async(urlsafe_key).get_result()
+
+    @ndb.tasklet
+    def _get_entity_by_key_async(self, urlsafe_key):
+        """Get an existing entity from a specified key, asynchronously."""
         try:
-            entity = ndb.Key(urlsafe=urlsafe_key).get()
+            entity = yield ndb.Key(urlsafe=urlsafe_key).get_async()
         except Exception as error:
             # All kinds of errors can happen with user-provided keys
             logging.error(
@@ -567,11 +674,64 @@ class ConferenceApi(remote.Service):
             raise endpoints.NotFoundException(
                 "No entity found with key: {0}.".format(urlsafe_key))
 
-        return entity
+        raise ndb.Return(entity)
+
+    def _get_sessions_page_as_message(self, query, request, post_filter=None):
+        """Get one page of `query` sessions as a SessionsResponseMessage.
+
+        Sessions not matching `post_filter` (if given) are dropped from the
+        page, so a page may be short without being the last one.
+        """
+        sessions, next_page_token = self._fetchPage(
+            query, request.page_size, request.page_token)
+        if post_filter:
+            sessions = [session for session in sessions if post_filter(session)]
+
+        sessions_message = Session.to_messages(sessions)
+        sessions_message.next_page_token = next_page_token
+        return sessions_message
+
+    def _get_schedule(self, urlsafe_conference_key):
+        """Get the schedule (session messages) of a specified conference."""
+        try:
+            conference_key = ndb.Key(urlsafe=urlsafe_conference_key)
+        except Exception:
+            # All kinds of errors can happen with user-provided keys
+            conference_key = None
+
+        schedule = None
+        if conference_key and conference_key.kind() == Conference._get_kind():
+            schedule = schedules.get_schedule(conference_key)
+        if schedule is None:
+            raise endpoints.NotFoundException(
+                "No entity found with key: {0}.".format(urlsafe_conference_key))
+
+        return schedule
+
+    def _get_schedule_page_as_message(self, session_messages, request):
+        """Get one page of schedule sessions as a SessionsResponseMessage.
+
+        Page tokens are offsets into the (sorted) schedule sessions.
+        """
+        page_size = min(request.page_size or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+        if page_size < 1:
+            raise endpoints.BadRequestException("Page size must be positive.")
+        try:
+            offset = int(request.page_token or 0)
+        except ValueError:
+            raise endpoints.BadRequestException("Invalid page token.")
+        if offset < 0:
+            raise endpoints.BadRequestException("Invalid page token.")
+
+        end = offset + page_size
+        return SessionsResponseMessage(
+            sessions=session_messages[offset:end],
+            next_page_token=str(end) if end < len(session_messages) else None)
 
     @endpoints.method(
         SpeakerRequestMessage, SpeakerResponseMessage,
         path='speaker', http_method='POST', name='createSpeaker')
+    @instrumented
     def create_speaker(self, request):
         """Create a new speaker."""
         user = endpoints.get_current_user()
@@ -587,6 +747,7 @@ class ConferenceApi(remote.Service):
         containers.SESSION_CONFERENCE_REQUEST, SessionResponseMessage,
         path='conference/{conference}/session',
         http_method='POST', name='createSession')
+    @instrumented
     def create_session(self, request):
         """Create a new session for a specified conference."""
         try:
@@ -599,6 +760,11 @@ class ConferenceApi(remote.Service):
         except ValueError:
             raise endpoints.BadRequestException(
                 "Time must be in format HH-MM (24 hour clock).")
+        try:
+            duration = int(request.duration) if request.duration else None
+        except ValueError:
+            raise endpoints.BadRequestException(
+                "Duration must be a number (of minutes).")
 
         user = endpoints.get_current_user()
         if not user:
@@ -621,50 +787,87 @@ class ConferenceApi(remote.Service):
         session = Session(
             key=session_key, name=request.name,
             highlights=request.highlights, speaker_key=speaker.key,
-            duration=request.duration,
+            duration=duration,
             type_of_session=request.type_of_session,
             date=date, start_time=start_time)
-        session.put()
+        schedules.put_sessions(conference.key, [session])
+        session_queries.register_session_type(session.type_of_session)
+        featured_speakers.schedule_update(conference.key)
+        conference_search.schedule_index([conference.key])
 
-        taskqueue.add(
-            params={
-                'speaker_key': speaker.key.urlsafe(),
-                'conference_key': conference.key.urlsafe()},
-            url='/tasks/store_featured_speaker')
+        return session.to_message(speaker)
 
-        return session.to_message()
+    @endpoints.method(
+        SpeakersRequestMessage, SpeakersResponseMessage,
+        path='speakers', http_method='POST', name='createSpeakers')
+    @instrumented
+    def create_speakers(self, request):
+        """Create new speakers in bulk."""
+        user = endpoints.get_current_user()
+        if not user:
+            raise endpoints.UnauthorizedException("Authorization required.")
+
+        speakers = bulk_import.create_speakers(
+            [speaker.name for speaker in request.speakers])
+
+        return SpeakersResponseMessage(
+            speakers=[speaker.to_message() for speaker in speakers])
+
+    @endpoints.method(
+        containers.SESSIONS_CONFERENCE_REQUEST, SessionsResponseMessage,
+        path='conference/{conference}/sessions',
+        http_method='POST', name='createSessions')
+    @instrumented
+    def create_sessions(self, request):
+        """Create new sessions for a specified conference in bulk."""
+        user = endpoints.get_current_user()
+        if not user:
+            raise endpoints.UnauthorizedException("Authorization required.")
+
+        conference = self._get_entity_by_key(request.conference)
+
+        if getUserId(user) != conference.organizerUserId:
+            raise endpoints.ForbiddenException(
+                "Only the conference organizer can add sessions.")
+
+        sessions = bulk_import.create_sessions(conference, [
+            dict((field.name, getattr(session, field.name)) for
+                 field in session.all_fields()) for
+            session in request.sessions])
+
+        return Session.to_messages(sessions)
 
     @endpoints.method(
         containers.CONFERENCE_REQUEST, SessionsResponseMessage,
         path='conference/{conference}/sessions', name='getConferenceSessions',
         http_method='GET')
+    @instrumented
     def get_conference_sessions(self, request):
         """Get all sessions for a specified conference."""
-        conference = self._get_entity_by_key(request.conference)
-        conference_sessions = Session.query(ancestor=conference.key)
+        conference_sessions = self._get_schedule(request.conference)
 
-        return SessionsResponseMessage(
-            sessions=[session.to_message() for session in conference_sessions])
+        return self._get_schedule_page_as_message(
+            conference_sessions, request)
 
     @endpoints.method(
         containers.SESSIONS_BY_TYPE_REQUEST, SessionsResponseMessage,
         path='conference/{conference}/sessions/type/{type_of_session}',
         name='getConferenceSessionsByType', http_method='GET')
+    @instrumented
     def get_conference_sessions_by_type(self, request):
         """Get all sessions for a conference by the specified type."""
-        conference = self._get_entity_by_key(request.conference)
-        conference_sessions_by_type = (
-            Session.query(ancestor=conference.key).filter(
-                Session.type_of_session == request.type_of_session).fetch())
+        conference_sessions_by_type = [
+            session for session in self._get_schedule(request.conference) if
+            session.type_of_session == request.type_of_session]
 
-        return SessionsResponseMessage(
-            sessions=[session.to_message() for
-                      session in conference_sessions_by_type])
+        return self._get_schedule_page_as_message(
+            conference_sessions_by_type, request)
 
     @endpoints.method(
         containers.SESSIONS_BY_SPEAKER_REQUEST, SessionsResponseMessage,
         path='sessions/speaker/{speaker_key}', name='getSessionsBySpeaker',
         http_method='GET')
+    @instrumented
     def get_sessions_by_speaker(self, request):
         """Get all sessions for a specified speaker."""
         speaker = self._get_entity_by_key(request.speaker_key)
@@ -672,17 +875,25 @@ class ConferenceApi(remote.Service):
         # Get all the sessions by `speaker`
         sessions = speaker.session_set()
 
-        return SessionsResponseMessage(
-            sessions=[session.to_message() for session in sessions])
+        return self._get_sessions_page_as_message(sessions, request)
 
     @endpoints.method(
         containers.SESSION_REQUEST, SessionsResponseMessage,
         http_method='POST', path='profile/wish/{session}',
         name='addSessionToWishlist')
+    @instrumented
     def add_session_to_wishlist(self, request):
         """Add a session to a user's wishlist."""
-        profile = self._getProfileFromUser()
-        session = self._get_entity_by_key(request.session)
+        return self._add_session_to_wishlist_async(
+            request.session).get_result()
+
+    @ndb.tasklet
+    def _add_session_to_wishlist_async(self, urlsafe_session_key):
+        """Add a session to a user's wishlist, returning the new wishlist."""
+        # Profile and session don't depend on each other; get them together
+        profile, session = yield (
+            self._getProfileFromUserAsync(),
+            self._get_entity_by_key_async(urlsafe_session_key))
 
         # Make sure session hasn't already been added
         if session.key in profile.sessions_wishlist:
@@ -690,76 +901,83 @@ class ConferenceApi(remote.Service):
                 "You have already added this session to your wishlist.")
 
         profile.sessions_wishlist.append(session.key)
-        profile.put()
-
-        # Return the new, complete wishlist
-        return self._get_wishlist_sessions_as_message(profile)
 
-    def _get_wishlist_sessions(self, profile):
-        """Get the wishlist sessions for a specified user (profile)."""
-        return ndb.get_multi([key for key in profile.sessions_wishlist])
+        # Return the new, complete wishlist (fetched while the profile is put)
+        _, wishlist_message = yield (
+            profile.put_async(),
+            self._get_wishlist_sessions_as_message_async(profile))
+        raise ndb.Return(wishlist_message)
 
-    def _get_wishlist_sessions_as_message(self, profile):
+    @ndb.tasklet
+    def _get_wishlist_sessions_as_message_async(self, profile):
         """Get the wishlist sessions as a SessionsResponseMessage."""
-        wishlist_sessions = self._get_wishlist_sessions(profile)
+        wishlist_sessions = yield ndb.get_multi_async(
+            profile.sessions_wishlist)
 
-        return SessionsResponseMessage(
-            sessions=[wishlist_session.to_message() for
-                      wishlist_session in wishlist_sessions if
-                      wishlist_session])
+        # Sessions deleted since being wishlisted come back as None and are
+        # skipped by `to_messages_async`
+        wishlist_message = yield Session.to_messages_async(wishlist_sessions)
+        raise ndb.Return(wishlist_message)
 
     @endpoints.method(
         message_types.VoidMessage, SessionsResponseMessage,
         path='profile/wishes', name='getSessionsInWishlist',
         http_method='GET')
+    @instrumented
     def get_sessions_in_wishlist(self, request):
         """Get all sessions from a user's wishlist."""
         profile = self._getProfileFromUser()
 
-        return self._get_wishlist_sessions_as_message(profile)
+        return self._get_wishlist_sessions_as_message_async(
+            profile).get_result()
 
     @endpoints.method(
         containers.SESSION_REQUEST, SessionsResponseMessage,
         http_method='DELETE', path='profile/wish/{session}',
         name='deleteSessionInWishlist')
+    @instrumented
     def delete_session_in_wishlist(self, request):
         """Delete a session from a user's wishlist."""
-        profile = self._getProfileFromUser()
-        session = self._get_entity_by_key(request.session)
+        return self._delete_session_in_wishlist_async(
+            request.session).get_result()
+
+    @ndb.tasklet
+    def _delete_session_in_wishlist_async(self, urlsafe_session_key):
+        """Delete a session from a user's wishlist, returning the rest."""
+        profile, session = yield (
+            self._getProfileFromUserAsync(),
+            self._get_entity_by_key_async(urlsafe_session_key))
 
         profile.sessions_wishlist.remove(session.key)
-        profile.put()
 
-        return self._get_wishlist_sessions_as_message(profile)
+        _, wishlist_message = yield (
+            profile.put_async(),
+            self._get_wishlist_sessions_as_message_async(profile))
+        raise ndb.Return(wishlist_message)
 
     @endpoints.method(
-        message_types.VoidMessage, SessionsResponseMessage,
+        containers.SESSIONS_PAGE_REQUEST, SessionsResponseMessage,
         path='sessions/non-workshop-before-seven',
         name='getSessionsNonWorkshopBefore7pm', http_method='GET')
+    @instrumented
     def get_sessions_nonworkshop_before_7pm(self, request):
         """Get all non-workshop sessions occurring before or at 7PM."""
-        # Ideally we would hard-code a list of supported session types
-        non_workshop_sessions = Session.query().filter(
-            Session.type_of_session != 'workshop').fetch(
-            projection=[Session.type_of_session])
-        # Get the unique "list" of actual session types
-        non_workshop_sessions = set([
-            session.type_of_session for
-            session in non_workshop_sessions if session.type_of_session])
-
         seven_pm = datetime.strptime('19:00', '%H:%M').time()
 
-        sessions = Session.query(
-            Session.type_of_session.IN(non_workshop_sessions)).filter(
-            Session.start_time <= seven_pm).fetch()
+        # A single query on `is_workshop` & `start_time`; see session_queries
+        sessions, post_filter = session_queries.plan_sessions_query(
+            exclude_types=['workshop'], before=seven_pm)
+        if sessions is None:
+            return SessionsResponseMessage()
 
-        return SessionsResponseMessage(
-            sessions=[session.to_message() for session in sessions])
+        return self._get_sessions_page_as_message(
+            sessions, request, post_filter)
 
     @endpoints.method(
         containers.SESSIONS_BY_DATE_REQUEST, SessionsResponseMessage,
         path='conference/{conference}/sessions/date/{date}',
         name='getConferenceSessionsByDate', http_method='GET')
+    @instrumented
     def get_conference_sessions_by_date(self, request):
         """Get all conference sessions for a specified date."""
         try:
@@ -768,35 +986,201 @@ class ConferenceApi(remote.Service):
             raise endpoints.BadRequestException(
                 "Date must be in format YYYY-MM-DD.")
 
-        conference = self._get_entity_by_key(request.conference)
-        sessions = Session.query(ancestor=conference.key).filter(
-            Session.date == date).order(Session.start_time).fetch()
+        sessions = schedules.on_date(
+            self._get_schedule(request.conference), date)
 
-        return SessionsResponseMessage(
-            sessions=[session.to_message() for session in sessions])
+        return self._get_schedule_page_as_message(sessions, request)
 
     @endpoints.method(
         containers.CONFERENCE_REQUEST, SessionsResponseMessage,
         path='conference/{conference}/sessions/interactive',
         name='getInteractiveConferenceSessions', http_method='GET')
+    @instrumented
     def get_interactive_conference_sessions(self, request):
         """Get all conference sessions that are interactive."""
-        conference = self._get_entity_by_key(request.conference)
-
-        sessions = Session.query(ancestor=conference.key).filter(
-            Session.type_of_session.IN(INTERACTIVE_SESSION_TYPES)).fetch()
+        sessions = [
+            session for session in self._get_schedule(request.conference) if
+            session.type_of_session in INTERACTIVE_SESSION_TYPES]
 
-        return SessionsResponseMessage(
-            sessions=[session.to_message() for session in sessions])
+        return self._get_schedule_page_as_message(sessions, request)
 
     @endpoints.method(
         message_types.VoidMessage, StringMessage,
         path='speaker/featured', name='getFeaturedSpeaker', http_method='GET')
+    @instrumented
     def get_featured_speaker(self, request):
         """Get the speaker to feature from memcache."""
         return StringMessage(
             data=memcache.get(MEMCACHE_FEATURED_SPEAKER) or "")
 
+    @endpoints.method(
+        containers.CONF_GET_REQUEST, StringMessage,
+        path='conference/{websafeConferenceKey}/speaker/featured',
+        name='getConferenceFeaturedSpeaker', http_method='GET')
+    @instrumented
+    def get_conference_featured_speaker(self, request):
+        """Get the speaker to feature for a specified conference."""
+        conference = self._get_entity_by_key(request.websafeConferenceKey)
+        return StringMessage(data=featured_speakers.get(conference.key))
+
+    @endpoints.method(
+        containers.SEARCH_CONFERENCES_REQUEST, ConferenceForms,
+        path='conferences/search', name='searchConferences',
+        http_method='GET')
+    @instrumented
+    def search_conferences(self, request):
+        """Search conferences by words (or the start of words), best first.
+
+        Matches conference names, descriptions, cities and topics, and the
+        names and highlights of their sessions and speakers.
+        """
+        page_size = min(request.page_size or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+        if page_size < 1:
+            raise endpoints.BadRequestException("Page size must be positive.")
+        try:
+            conference_keys, next_page_token, _ = (
+                conference_search.search_conferences(
+                    request.query or '', page_size, request.page_token))
+        except ValueError as error:
+            raise endpoints.BadRequestException(str(error))
+
+        # Conferences deleted since being indexed are skipped
+        conferences = [conference for conference in
+                       entity_cache.get_multi(conference_keys) if conference]
+        seats = seat_counter.get_counts(conferences)
+        return ConferenceForms(
+            items=[self._copyConferenceToForm(
+                conference, seatsAvailable=seats_available) for
+                conference, seats_available in zip(conferences, seats)],
+            nextPageToken=next_page_token)
+
+    @endpoints.method(
+        ConferenceFeedRequestMessage, ConferenceFeedResponseMessage,
+        path='conferences/feed', http_method='POST',
+        name='getConferenceFeed')
+    @instrumented
+    def get_conference_feed(self, request):
+        """Get a page of all, created or attended conferences, sorted.
+
+        Returns the total number of conferences in the feed too, so that
+        clients can fetch any page on demand.
+        """
+        page_size = min(request.page_size or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+        if page_size < 1 or request.page < 0:
+            raise endpoints.BadRequestException(
+                "Page size must be positive and page not negative.")
+        offset = request.page * page_size
+        sort = request.sort.name
+
+        if request.feed == ConferenceFeed.ALL:
+            conferences, seats, total_count, truncated = (
+                conference_feeds.get_all_page(
+                    self._getQuery(request), sort, offset, page_size))
+        else:
+            profile = self._getProfileFromUser()
+            if request.feed == ConferenceFeed.CREATED:
+                conference_keys = Conference.query(
+                    ancestor=profile.key).fetch(keys_only=True)
+            else:
+                conference_keys = self._getProfileCache().get_conference_keys(
+                    profile.key.id())
+            conferences, seats, total_count, truncated = (
+                conference_feeds.get_page(
+                    conference_keys, sort, offset, page_size))
+
+        # Organizer names are stored on each conference
+        return ConferenceFeedResponseMessage(
+            items=[self._copyConferenceToForm(
+                conference, seatsAvailable=seats_available) for
+                conference, seats_available in zip(conferences, seats)],
+            total_count=total_count, page=request.page, page_size=page_size,
+            truncated=truncated)
+
+    @endpoints.method(
+        containers.CONF_GET_REQUEST, BooleanMessage,
+        path='conference/{websafeConferenceKey}/registered',
+        http_method='GET', name='isRegisteredForConference')
+    @instrumented
+    def is_registered_for_conference(self, request):
+        """Check whether the user is registered for a conference."""
+        profile = self._getProfileFromUser()
+        conference = self._get_entity_by_key(request.websafeConferenceKey)
+
+        # The user's (cached) registrations spare a get
+        return BooleanMessage(data=conference.key in (
+            self._getProfileCache().get_conference_keys(profile.key.id())))
+
+    @endpoints.method(
+        containers.CONFERENCE_REQUEST, AttendeesResponseMessage,
+        path='conference/{conference}/attendees', http_method='GET',
+        name='getConferenceAttendees')
+    @instrumented
+    def get_conference_attendees(self, request):
+        """Get the users registered for a conference (organizer only)."""
+        user = endpoints.get_current_user()
+        if not user:
+            raise endpoints.UnauthorizedException("Authorization required.")
+
+        conference = self._get_entity_by_key(request.conference)
+        if getUserId(user) != conference.organizerUserId:
+            raise endpoints.ForbiddenException(
+                "Only the conference organizer can list attendees.")
+
+        conference_registrations, next_page_token = self._fetchPage(
+            registrations.attendees_query(conference.key),
+            request.page_size, request.page_token)
+        profiles = ndb.get_multi([registration.key.parent() for
+                                  registration in conference_registrations])
+
+        return AttendeesResponseMessage(
+            attendees=[serializers.serialize(
+                profile, ProfileForm, conferenceKeysToAttend=[]) for
+                profile in profiles if profile],
+            # Seats taken, rather than counting registrations every request
+            count=max(0, (conference.maxAttendees or 0) -
+                      seat_counter.get_counts([conference])[0]),
+            next_page_token=next_page_token)
+
+    @endpoints.method(
+        containers.CONF_GET_REQUEST, RegistrationTicketMessage,
+        path='conference/{websafeConferenceKey}/queue', http_method='POST',
+        name='queueRegistrationForConference')
+    @instrumented
+    def queue_registration_for_conference(self, request):
+        """Queue registration for a conference, returning a pending ticket.
+
+        Unlike `registerForConference`, this returns without running a
+        transaction; registrations are applied in batches by a task, which
+        avoids transaction collisions when a popular conference opens.
+        """
+        profile = self._getProfileFromUser()
+        conference = self._get_entity_by_key(request.websafeConferenceKey)
+
+        return registration_queue.enqueue(
+            profile.key, conference.key).to_message()
+
+    @endpoints.method(
+        containers.REGISTRATION_TICKET_REQUEST, RegistrationTicketMessage,
+        path='registration/{ticket}', http_method='GET',
+        name='getRegistrationTicket')
+    @instrumented
+    def get_registration_ticket(self, request):
+        """Get the status of a queued conference registration."""
+        user = endpoints.get_current_user()
+        if not user:
+            raise endpoints.UnauthorizedException("Authorization required.")
+
+        ticket = self._get_entity_by_key(request.ticket)
+        if ticket.key.kind() != RegistrationTicket._get_kind():
+            raise endpoints.NotFoundException(
+                "No registration ticket found with key: {0}.".format(
+                    request.ticket))
+        if ticket.key.parent() != ndb.Key(Profile, getUserId(user)):
+            raise endpoints.ForbiddenException(
+                "Only the registering user can view this ticket.")
+
+        return ticket.to_message()
+
     # end: brenj additions to conference.py
     #######################################
 
@@ -0,0 +1,191 @@
+"""Sorted, paged conference feeds for Conference Central.
+
+The show-conferences page lists all conferences (matching some filters),
+those a user created or those they're registered for, one page at a time
+with the total count. Feeds are sorted by start date, seats available or
+name, and conferences are got through `entity_cache`.
+
+An unfiltered all-conferences feed sorted by start date or name is read a
+page at a time from a keys-only datastore query in that order, served by
+the built-in single-property indexes, so it has no size limit. Any other
+feed is sorted in memory: seat counts aren't indexed, and ordering filtered
+conferences would need a composite index per combination of filters (see
+`conference_queries`). The sorted keys of such an all-conferences feed are
+cached in memcache, so paging through it doesn't list it again. At most
+`MAX_FEED_SIZE` conferences are listed; a longer feed is reported as
+truncated. Cached keys and counts are dropped when a conference is created
+or updated (`bump_generation`), but seat counts change all the time, so
+the seats order may lag them by up to `FEED_CACHE_TIME`.
+"""
+
+from datetime import date
+import hashlib
+import time
+
+from google.appengine.api import memcache
+from google.appengine.ext import ndb
+
+import entity_cache
+from models import Conference
+import seat_counter
+
+MEMCACHE_GENERATION_KEY = "FEED_GENERATION"
+MEMCACHE_FEED_KEY = "FEED:{0}:{1}"  # generation, feed digest
+FEED_CACHE_TIME = 60
+FETCH_SIZE = 200
+# Conferences listed per feed sorted in memory at most; the sorted keys
+# fit in memcache
+MAX_FEED_SIZE = 5000
+
+# Sort keys of (conference, seats available), by sort option. Names sort
+# as the datastore orders them, so in-memory and datastore feeds agree
+SORT_KEYS = {
+    # Conferences without a start date sort last
+    'START_DATE': lambda conference, seats: (
+        conference.startDate is None, conference.startDate, conference.name),
+    # Most seats available first
+    'SEATS_AVAILABLE': lambda conference, seats: (
+        -(seats or 0), conference.name),
+    'NAME': lambda conference, seats: conference.name,
+}
+
+
+def _ordered_queries(sort):
+    """Get the keys-only datastore queries listing all conferences in order.
+
+    A feed is their results one after the other; None if `sort` can't be
+    served by a built-in index.
+    """
+    if sort == 'START_DATE':
+        # Conferences without a start date (null sorts first) go last
+        return [
+            Conference.query(Conference.startDate >= date.min).order(
+                Conference.startDate, Conference.key),
+            Conference.query(Conference.startDate == None).order(
+                Conference.key)]
+    if sort == 'NAME':
+        return [Conference.query().order(Conference.name, Conference.key)]
+    return None
+
+
+def bump_generation():
+    """Drop the cached all-conferences feeds, once committed."""
+    # Outside a transaction the callback runs immediately
+    ndb.get_context().call_on_commit(
+        lambda: memcache.incr(MEMCACHE_GENERATION_KEY))
+
+
+def _generation():
+    """Get the generation of the cached all-conferences feeds."""
+    generation = memcache.get(MEMCACHE_GENERATION_KEY)
+    if generation is None:
+        # Seeded from the clock so that a generation lost to eviction never
+        # restarts at one whose feeds are still cached
+        memcache.add(MEMCACHE_GENERATION_KEY, int(time.time() * 1000))
+        generation = memcache.get(MEMCACHE_GENERATION_KEY)
+    return generation
+
+
+def _cache_key(generation, description):
+    """Get the memcache key of something cached for a feed."""
+    return MEMCACHE_FEED_KEY.format(
+        generation, hashlib.md5(description).hexdigest())
+
+
+def _sort(conferences, seats, sort):
+    """Sort conferences (with their seats), ties broken by key."""
+    sort_key = SORT_KEYS[sort]
+    return sorted(zip(conferences, seats), key=lambda item: (
+        sort_key(*item), item[0].key.urlsafe()))
+
+
+def _page(sorted_items, offset, limit):
+    """Split a page of sorted (conference, seats) into two lists."""
+    page = sorted_items[offset:offset + limit]
+    return [conference for conference, _ in page], [seats for _, seats in page]
+
+
+def _list(plan):
+    """List (up to MAX_FEED_SIZE of) the conferences of a query plan.
+
+    Returns (conferences, whether there were more).
+    """
+    conferences = []
+    cursor = None
+    more = True
+    while more and len(conferences) < MAX_FEED_SIZE:
+        page, cursor, more = plan.fetch_page(FETCH_SIZE, start_cursor=cursor)
+        conferences.extend(page)
+        more = more and cursor is not None
+    truncated = more or len(conferences) > MAX_FEED_SIZE
+    return conferences[:MAX_FEED_SIZE], truncated
+
+
+def _get_ordered_page(queries, sort, offset, limit):
+    """Get a page of all conferences from datastore queries in order.
+
+    Returns (conferences, their seats available, total number).
+    """
+    generation = _generation()
+    cache_key = _cache_key(generation, 'count|{0}'.format(sort))
+    counts = memcache.get(cache_key) if generation is not None else None
+    if counts is None:
+        counts = [query.count(keys_only=True) for query in queries]
+        if generation is not None:
+            memcache.set(cache_key, counts, time=FEED_CACHE_TIME)
+
+    keys = []
+    for query, count in zip(queries, counts):
+        if offset < count and len(keys) < limit:
+            # Skipped index entries are only counted, not returned
+            keys.extend(query.fetch(limit - len(keys), offset=offset,
+                                    keys_only=True))
+        offset = max(0, offset - count)
+
+    conferences = [conference for conference in entity_cache.get_multi(keys)
+                   if conference]
+    return conferences, seat_counter.get_counts(conferences), sum(counts)
+
+
+def get_page(conference_keys, sort, offset, limit):
+    """Get a page of conferences by key, sorted.
+
+    Returns (conferences, their seats available, total number, whether the
+    feed was truncated).
+    """
+    conferences = [conference for conference in
+                   entity_cache.get_multi(conference_keys) if conference]
+    items = _sort(conferences, seat_counter.get_counts(conferences), sort)
+    return _page(items, offset, limit) + (len(items), False)
+
+
+def get_all_page(plan, sort, offset, limit):
+    """Get a page of the conferences of a query plan, sorted.
+
+    Returns (conferences, their seats available, total number, whether the
+    feed was truncated to MAX_FEED_SIZE).
+    """
+    queries = _ordered_queries(sort)
+    if queries and not (plan.pushed or plan.residual):
+        return _get_ordered_page(queries, sort, offset, limit) + (False,)
+
+    generation = _generation()
+    cache_key = _cache_key(generation, '{0}|{1}'.format(plan, sort))
+    cached = memcache.get(cache_key) if generation is not None else None
+
+    if cached is None:
+        conferences, truncated = _list(plan)
+        items = _sort(conferences, seat_counter.get_counts(conferences), sort)
+        if generation is not None:
+            memcache.set(cache_key, ([conference.key.urlsafe() for
+                                      conference, _ in items], truncated),
+                         time=FEED_CACHE_TIME)
+        return _page(items, offset, limit) + (len(items), truncated)
+
+    # Conferences (and seats) are current; only the order is cached
+    sorted_keys, truncated = cached
+    conferences = entity_cache.get_multi([
+        ndb.Key(urlsafe=wsck) for wsck in sorted_keys[offset:offset + limit]])
+    conferences = [conference for conference in conferences if conference]
+    return (conferences, seat_counter.get_counts(conferences),
+            len(sorted_keys), truncated)
@@ -0,0 +1,166 @@
+"""Planned conference queries for Conference Central.
+
+Datastore queries allow inequality filters on one property only, and every
+combination of filtered and sorted properties needs its own composite index.
+`plan_conferences_query` instead pushes down only filters that the built-in
+single-property indexes can serve: all the equality filters (merged by the
+datastore), or else the range on one property. The other filters (a second
+inequality, `!=`, ...) are checked in memory while streaming the datastore
+query's keys and getting the conferences in batches, so `queryConferences`
+accepts any combination of filters and needs no composite indexes. Either
+way the datastore query is keys-only and conferences are got through
+`entity_cache`.
+"""
+
+import operator
+
+from google.appengine.ext import ndb
+
+import entity_cache
+from models import Conference
+
+COMPARISONS = {
+    '=': operator.eq,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '<': operator.lt,
+    '<=': operator.le,
+    '!=': operator.ne,
+}
+# Fields in the order their ranges are pushed down when there's a choice
+RANGE_FIELDS = ('month', 'maxAttendees', 'city', 'topics')
+BATCH_SIZE = 50
+# Conferences checked in memory per page; a page may be short of matches
+MAX_SCANNED = 1000
+
+
+def _describe(filters):
+    """Describe (field, operator, value) filters for the plan's debug output."""
+    return ' AND '.join('{0} {1} {2!r}'.format(*filtr) for
+                        filtr in filters) or 'all'
+
+
+def _matches(conference, filters):
+    """Check a conference against (field, operator, value) filters.
+
+    As in the datastore, a filter on a repeated property (`topics`) matches
+    if any of its values does, and a missing value matches nothing but `=`.
+    """
+    for field, op, value in filters:
+        values = getattr(conference, field)
+        if not isinstance(values, list):
+            values = [values]
+        if not any(COMPARISONS[op](v, value) for v in values
+                   if v is not None or op == '='):
+            return False
+    return True
+
+
+class ConferencesQueryPlan(object):
+
+    """A datastore query plus the filters to check in memory."""
+
+    def __init__(self, pushed, residual):
+        self.pushed = pushed
+        self.residual = residual
+
+        query = Conference.query()
+        for field, op, value in pushed:
+            query = query.filter(ndb.query.FilterNode(field, op, value))
+        # Each order is served by a built-in index; key order last keeps
+        # cursors usable
+        ranges = [field for field, op, _ in pushed if op != '=']
+        if ranges:
+            query = query.order(ndb.GenericProperty(ranges[0]), Conference.key)
+        elif pushed:
+            query = query.order(Conference.key)
+        else:
+            query = query.order(Conference.name, Conference.key)
+        self.query = query
+
+    def __str__(self):
+        return 'datastore: {0}; in memory: {1}'.format(
+            _describe(self.pushed), _describe(self.residual) if
+            self.residual else 'none')
+
+    def _key_batches(self, start_cursor):
+        """Yield lists of (key, cursor after key) from the datastore query."""
+        keys = self.query.iter(keys_only=True, start_cursor=start_cursor,
+                               produce_cursors=True, batch_size=BATCH_SIZE)
+        batch = []
+        for key in keys:
+            batch.append((key, keys.cursor_after()))
+            if len(batch) == BATCH_SIZE:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def fetch_page(self, page_size, start_cursor=None):
+        """Fetch a page of matching conferences, like `ndb.Query.fetch_page`.
+
+        Returns (conferences, cursor, more). Conferences are got through
+        `entity_cache` for the keys of a keys-only query. At most
+        MAX_SCANNED conferences are checked in memory, so a page may be
+        short without being the last.
+        """
+        if not self.residual:
+            keys, cursor, more = self.query.fetch_page(
+                page_size, start_cursor=start_cursor, keys_only=True)
+            return ([conference for conference in entity_cache.get_multi(keys)
+                     if conference], cursor, more)
+
+        filters = self.pushed + self.residual
+        conferences = []
+        cursor = start_cursor
+        scanned = 0
+        batches = self._key_batches(start_cursor)
+        batch = next(batches, None)
+        while batch:
+            batch_conferences = entity_cache.get_multi(
+                [key for key, _ in batch])
+            next_batch = next(batches, None)
+            for i, ((_, key_cursor), conference) in enumerate(
+                    zip(batch, batch_conferences)):
+                cursor = key_cursor
+                # Pushed filters are checked again; the query is only
+                # eventually consistent with the conferences
+                if conference and _matches(conference, filters):
+                    conferences.append(conference)
+                    if len(conferences) == page_size:
+                        more = i < len(batch) - 1 or next_batch is not None
+                        return conferences, cursor, more
+            scanned += len(batch)
+            if scanned >= MAX_SCANNED:
+                return conferences, cursor, next_batch is not None
+            batch = next_batch
+        return conferences, cursor, False
+
+
+def plan_conferences_query(filters):
+    """Plan a query for conferences matching all (field, operator, value)s.
+
+    Equality filters are pushed down to the datastore if there are any (it
+    merges them using built-in indexes); otherwise the range filters on one
+    field are, preferring closed ranges. Everything else, including every
+    `!=`, is checked in memory.
+    """
+    equalities = [filtr for filtr in filters if filtr[1] == '=']
+    if equalities:
+        pushed = equalities
+    else:
+        bounds = {}
+        for field, op, _ in filters:
+            if op != '!=':
+                bounds.setdefault(field, set()).add(op[0])
+        if bounds:
+            # A closed range (both '<' and '>') is likely the most selective
+            field = min(bounds, key=lambda field: (
+                -len(bounds[field]), RANGE_FIELDS.index(field)))
+            pushed = [filtr for filtr in filters if
+                      filtr[0] == field and filtr[1] != '!=']
+        else:
+            pushed = []
+
+    return ConferencesQueryPlan(
+        pushed, [filtr for filtr in filters if filtr not in pushed])
@@ -0,0 +1,171 @@
+"""Full-text and prefix search of conferences for Conference Central.
+
+Each conference is a document in the `conferences` Search API index, with
+its name, description, city and topics plus the names and highlights of its
+sessions and the names of their speakers. Every prefix of the words in the
+shorter fields is indexed too, so a query matches partially typed words.
+The Search API answers from an inverted index, so a search costs in
+proportion to the conferences it matches, not to the number of conferences.
+
+Documents are (re)indexed by a task, debounced per conference like the
+featured speaker update, whenever a conference or its sessions change.
+"""
+
+from datetime import date
+import re
+import time
+
+from google.appengine.api import search
+from google.appengine.api import taskqueue
+from google.appengine.ext import ndb
+
+import schedules
+
+INDEX_NAME = 'conferences'
+INDEX_INTERVAL = 5  # seconds
+MIN_PREFIX_LENGTH = 2
+MAX_PREFIX_LENGTH = 20
+MAX_QUERY_WORDS = 10
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+# Conferences without a start date sort last
+NO_START_DATE = date(2999, 12, 31)
+
+
+def _words(*texts):
+    """Get the (lower case) words of `texts`."""
+    return [word for text in texts if text for
+            word in WORD_RE.findall(text.lower())]
+
+
+def _prefixes(words):
+    """Get the distinct prefixes (including whole words) of `words`."""
+    return set(word[:length] for word in words for length in
+               range(MIN_PREFIX_LENGTH,
+                     min(len(word), MAX_PREFIX_LENGTH) + 1))
+
+
+def _document(conference, schedule):
+    """Make the search document of a conference and its (session) schedule."""
+    sessions = ' '.join(session.name for session in schedule)
+    speakers = ' '.join(set(session.speaker.name for session in schedule))
+    short_texts = [conference.name, conference.city, sessions,
+                   speakers] + (conference.topics or [])
+
+    fields = [
+        search.TextField(name='name', value=conference.name),
+        search.TextField(name='description', value=conference.description),
+        search.TextField(name='city', value=conference.city),
+        search.TextField(name='topics',
+                         value=' '.join(conference.topics or [])),
+        search.TextField(name='sessions', value=sessions),
+        search.TextField(name='highlights', value=' '.join(
+            session.highlights for session in schedule if session.highlights)),
+        search.TextField(name='speakers', value=speakers),
+        search.TextField(name='prefixes',
+                         value=' '.join(_prefixes(_words(*short_texts)))),
+    ]
+    if conference.startDate:
+        fields.append(search.DateField(
+            name='startDate', value=conference.startDate))
+    return search.Document(doc_id=conference.key.urlsafe(), fields=fields)
+
+
+def index(conference_keys):
+    """(Re)index conferences, removing any that no longer exist."""
+    conferences = ndb.get_multi(conference_keys)
+    documents = [
+        _document(conference, schedules.get_schedule(conference.key) or [])
+        for conference in conferences if conference]
+    removed = [conference_key.urlsafe() for conference_key, conference in
+               zip(conference_keys, conferences) if not conference]
+
+    conference_index = search.Index(name=INDEX_NAME)
+    # The Search API takes at most 200 documents per call
+    for i in range(0, len(documents), search.MAXIMUM_DOCUMENTS_PER_PUT_REQUEST):
+        conference_index.put(
+            documents[i:i + search.MAXIMUM_DOCUMENTS_PER_PUT_REQUEST])
+    if removed:
+        conference_index.delete(removed)
+
+
+def schedule_index(conference_keys):
+    """Reindex conferences soon, once per conference per interval.
+
+    In a transaction, the tasks are only queued once it commits.
+    """
+    bucket = int(time.time()) // INDEX_INTERVAL
+    tasks = [taskqueue.Task(
+        name='index-conference-{0}-{1}'.format(conference_key.urlsafe(), bucket),
+        # Runs after the interval so changes made during it are included
+        countdown=max(0, (bucket + 1) * INDEX_INTERVAL - time.time()),
+        params={'conference_key': conference_key.urlsafe()},
+        url='/tasks/index_conference') for conference_key in conference_keys]
+
+    def add():
+        for i in range(0, len(tasks), taskqueue.MAX_TASKS_PER_ADD):
+            try:
+                taskqueue.Queue().add(tasks[i:i + taskqueue.MAX_TASKS_PER_ADD])
+            except (taskqueue.TaskAlreadyExistsError,
+                    taskqueue.TombstonedTaskError):
+                # Other tasks in the batch are still added
+                pass
+
+    # Outside a transaction the callback runs immediately
+    ndb.get_context().call_on_commit(add)
+
+
+def _query_string(text):
+    """Make a query matching conferences with all the words in `text`.
+
+    Each word matches as a whole word in any field, or as a prefix of a
+    word in the name, city, topics, session names or speaker names.
+    """
+    terms = []
+    for word in _words(text)[:MAX_QUERY_WORDS]:
+        if len(word) < MIN_PREFIX_LENGTH:
+            terms.append('"{0}"'.format(word))
+        else:
+            terms.append('("{0}" OR prefixes:"{1}")'.format(
+                word, word[:MAX_PREFIX_LENGTH]))
+    return ' '.join(terms)
+
+
+def search_conferences(text, page_size, page_token=None):
+    """Search conferences, best matches first.
+
+    Returns (conference keys, next page token, number of matches found).
+    Raises ValueError for an invalid page token.
+    """
+    query_string = _query_string(text)
+    if not query_string:
+        return [], None, 0
+
+    try:
+        cursor = search.Cursor(web_safe_string=page_token or None)
+    except Exception:
+        raise ValueError("Invalid page token.")
+
+    results = search.Index(name=INDEX_NAME).search(search.Query(
+        query_string=query_string,
+        options=search.QueryOptions(
+            limit=page_size,
+            cursor=cursor,
+            ids_only=True,
+            # Rank by how well (and how often) the words match, then by
+            # start date, soonest first
+            sort_options=search.SortOptions(
+                match_scorer=search.MatchScorer(),
+                expressions=[
+                    search.SortExpression(
+                        expression='_score',
+                        direction=search.SortExpression.DESCENDING,
+                        default_value=0),
+                    search.SortExpression(
+                        expression='startDate',
+                        direction=search.SortExpression.ASCENDING,
+                        default_value=NO_START_DATE),
+                ]))))
+
+    next_page_token = results.cursor.web_safe_string if results.cursor else None
+    return ([ndb.Key(urlsafe=document.doc_id) for document in results],
+            next_page_token, results.number_found)
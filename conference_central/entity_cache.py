@@ -0,0 +1,67 @@
+"""Versioned memcache cache of entities for Conference Central.
+
+Listings run keys-only queries and resolve the keys with `get_multi`, which
+serves entities from memcache under their key and current version and only
+gets misses from the datastore. Writers call `bump_version` so that entries
+cached before a change are never read again (seat counts are kept apart, in
+`seat_counter`, so registrations don't invalidate conferences). Hits and
+misses are counted per request by `instrumentation`.
+"""
+
+import time
+
+from google.appengine.api import memcache
+from google.appengine.ext import ndb
+
+import instrumentation
+
+MEMCACHE_VERSION_KEY = "VERSION:%s"
+MEMCACHE_ENTITY_KEY = "ENTITY:%s:%s"
+ENTITY_CACHE_TIME = 3600
+
+
+def get_versions(entity_keys):
+    """Return memcache versions for entity_keys (None if unavailable)."""
+    version_keys = [MEMCACHE_VERSION_KEY % key.urlsafe() for key in entity_keys]
+    versions = memcache.get_multi(version_keys)
+    missing = [k for k in version_keys if k not in versions]
+    if missing:
+        # seed from the clock so a version lost to eviction can never
+        # restart at a value still used by entries in the cache
+        seed = int(time.time() * 1000)
+        memcache.add_multi(dict((k, seed) for k in missing))
+        versions.update(memcache.get_multi(missing))
+    return [versions.get(k) for k in version_keys]
+
+
+def bump_version(entity_key):
+    """Invalidate cached entities (and forms) of entity_key, once committed."""
+    version_key = MEMCACHE_VERSION_KEY % entity_key.urlsafe()
+    # bumping before commit would let a reader re-cache the old data
+    # under the new version; outside a transaction this runs at once
+    ndb.get_context().call_on_commit(lambda: memcache.incr(version_key))
+
+
+@ndb.non_transactional
+def get_multi(entity_keys):
+    """Get entities by key like `ndb.get_multi`, through the cache."""
+    cache_keys = [MEMCACHE_ENTITY_KEY % (key.urlsafe(), version)
+                  if version is not None else None for key, version in
+                  zip(entity_keys, get_versions(entity_keys))]
+    cached = memcache.get_multi([k for k in cache_keys if k])
+    entities = [cached.get(k) for k in cache_keys]
+
+    # Keys without a version (memcache down) are always missing
+    missing = [i for i, k in enumerate(cache_keys) if k not in cached]
+    instrumentation.count('entity_cache.Hit', len(entity_keys) - len(missing))
+    instrumentation.count('entity_cache.Miss', len(missing))
+    if missing:
+        # ndb's own memcache layer would only duplicate this one
+        fetched = ndb.get_multi([entity_keys[i] for i in missing],
+                                use_memcache=False)
+        for i, entity in zip(missing, fetched):
+            entities[i] = entity
+        memcache.set_multi(dict(
+            (cache_keys[i], entity) for i, entity in zip(missing, fetched)
+            if cache_keys[i] and entity), time=ENTITY_CACHE_TIME)
+    return entities
@@ -0,0 +1,132 @@
+"""Featured speakers for Conference Central.
+
+The names of each conference's sessions are kept per speaker in one
+`ConferenceSpeakers` entity (in the conference's entity group), updated in
+the same transaction that stores sessions (see `schedules`). Choosing the
+featured speaker is then a single get instead of a query over the sessions,
+and it is debounced: however many sessions are added, at most one update
+task per conference runs every `UPDATE_INTERVAL` seconds.
+"""
+
+import time
+
+from google.appengine.api import memcache
+from google.appengine.api import taskqueue
+from google.appengine.ext import ndb
+
+from models import ConferenceSpeakers
+from models import Session
+
+MEMCACHE_FEATURED_SPEAKER = "FEATURED_SPEAKER"
+MEMCACHE_CONFERENCE_FEATURED_SPEAKER = "FEATURED_SPEAKER:{0}"
+UPDATE_INTERVAL = 5  # seconds
+
+
+def _speakers_key(conference_key):
+    """Get the key of a conference's ConferenceSpeakers entity."""
+    return ndb.Key(ConferenceSpeakers, 'speakers', parent=conference_key)
+
+
+def _add_session_names(speakers, sessions):
+    """Add the names of `sessions` to their speakers in `speakers`."""
+    for session in sessions:
+        speakers.session_names.setdefault(
+            session.speaker_key.urlsafe(), []).append(session.name)
+
+
+def _remove_session_names(speakers, sessions):
+    """Remove the names of `sessions` from their speakers in `speakers`."""
+    for session in sessions:
+        session_names = speakers.session_names.get(
+            session.speaker_key.urlsafe(), [])
+        if session.name in session_names:
+            session_names.remove(session.name)
+
+
+def record_sessions(conference_key, added=(), removed=()):
+    """Update a conference's speaker counts for added and removed sessions.
+
+    Call in the transaction that stores (or deletes) the sessions; a
+    session that is updated is both removed (old) and added (new).
+    """
+    speakers = (_speakers_key(conference_key).get() or
+                _rebuild(conference_key))
+    _remove_session_names(speakers, removed)
+    _add_session_names(speakers, added)
+    speakers.put()
+
+
+def _rebuild(conference_key):
+    """Build (unsaved) speaker counts for a conference from its sessions.
+
+    Only needed once, for conferences with sessions from before counts
+    were kept.
+    """
+    speakers = ConferenceSpeakers(key=_speakers_key(conference_key),
+                                  session_names={})
+    # Ancestor query means we get strongly-consistent results
+    _add_session_names(speakers, Session.query(ancestor=conference_key).fetch(
+        projection=[Session.speaker_key, Session.name]))
+    return speakers
+
+
+def schedule_update(conference_key):
+    """Update the conference's featured speaker soon, once per interval."""
+    wsck = conference_key.urlsafe()
+    bucket = int(time.time()) // UPDATE_INTERVAL
+    try:
+        # Runs after the interval so sessions added during it are included
+        taskqueue.add(
+            name='featured-speaker-{0}-{1}'.format(wsck, bucket),
+            countdown=max(0, (bucket + 1) * UPDATE_INTERVAL - time.time()),
+            params={'conference_key': wsck},
+            url='/tasks/store_featured_speaker')
+    except (taskqueue.TaskAlreadyExistsError, taskqueue.TombstonedTaskError):
+        pass
+
+
+def update(conference_key):
+    """Store the conference's featured speaker in memcache.
+
+    The featured speaker is the one with the most sessions, if that is more
+    than one, skipping deleted speakers. It is also stored as the latest
+    featured speaker overall.
+    """
+    speakers = _speakers_key(conference_key).get()
+    if not speakers:
+        speakers = _rebuild(conference_key)
+        speakers.put()
+    # Most sessions first; sorting is stable, so ties keep their order
+    candidates = sorted(
+        ((speaker_key, session_names) for speaker_key, session_names in
+         speakers.session_names.items() if len(session_names) >= 2),
+        key=lambda speaker_sessions: len(speaker_sessions[1]), reverse=True)
+    # Speakers may have been deleted since their sessions were added
+    speaker_entities = ndb.get_multi(
+        [ndb.Key(urlsafe=speaker_key) for speaker_key, _ in candidates])
+    featured = next(
+        ((speaker, session_names) for (_, session_names), speaker in
+         zip(candidates, speaker_entities) if speaker), None)
+    if not featured:
+        memcache.delete(MEMCACHE_CONFERENCE_FEATURED_SPEAKER.format(
+            conference_key.urlsafe()))
+        return None
+
+    speaker, session_names = featured
+    featured_speaker_message = "{0}: {1}".format(
+        speaker.name, ', '.join(session_names))
+    memcache.set_multi({
+        MEMCACHE_CONFERENCE_FEATURED_SPEAKER.format(conference_key.urlsafe()):
+            featured_speaker_message,
+        MEMCACHE_FEATURED_SPEAKER: featured_speaker_message,
+    })
+    return featured_speaker_message
+
+
+def get(conference_key):
+    """Get the conference's featured speaker message ("" if none)."""
+    featured_speaker_message = memcache.get(
+        MEMCACHE_CONFERENCE_FEATURED_SPEAKER.format(conference_key.urlsafe()))
+    if featured_speaker_message is None:
+        featured_speaker_message = update(conference_key)
+    return featured_speaker_message or ""
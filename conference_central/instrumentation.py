@@ -0,0 +1,168 @@
+"""Per-request RPC and latency instrumentation for ConferenceApi methods.
+
+`instrumented` wraps an endpoint method to count the API calls it makes
+(datastore, memcache, task queue, ...) and time it; `count` adds other
+counters, such as cache hits. Each call logs one
+structured line, and latencies are added to per-method histograms that are
+kept in memcache in `WINDOW_SECONDS` windows, from which `get_stats`
+reports rolling p50/p95/p99.
+
+When `settings.INSTRUMENT_ENDPOINTS` is off, `instrumented` returns methods
+unwrapped and no API hook is installed, so there is no overhead at all.
+"""
+
+import bisect
+import collections
+import functools
+import json
+import logging
+import threading
+import time
+
+from google.appengine.api import apiproxy_stub_map
+from google.appengine.api import memcache
+
+from settings import INSTRUMENT_ENDPOINTS
+
+# Upper bounds (ms) of the latency histogram buckets; the last is unbounded
+BUCKETS_MS = (5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+WINDOW_SECONDS = 300
+WINDOWS_KEPT = 12  # i.e. stats cover the last hour
+FLUSH_SECONDS = 10
+MEMCACHE_STATS_KEY = "STATS:{0}:{1}:{2}"  # method, window, counter
+# API calls averaged per request in the stats summary
+REPORTED_CALLS = ('datastore_v3.Get', 'datastore_v3.Put',
+                  'datastore_v3.RunQuery', 'memcache.Get', 'memcache.Set',
+                  'taskqueue.BulkAdd', 'entity_cache.Hit',
+                  'entity_cache.Miss')
+
+_request = threading.local()
+_pending = collections.Counter()
+_pending_lock = threading.Lock()
+_last_flush = [time.time()]
+_hook_installed = []
+
+
+def _count_call(service, call, request, response):
+    """API proxy hook counting calls made by the instrumented request."""
+    calls = getattr(_request, 'calls', None)
+    if calls is not None:
+        calls['{0}.{1}'.format(service, call)] += 1
+
+
+def count(name, n=1):
+    """Add `n` to a counter (e.g. cache hits) of the instrumented request."""
+    calls = getattr(_request, 'calls', None)
+    if calls is not None and n:
+        calls[name] += n
+
+
+def _install_hook():
+    """Install the counting hook (once per API proxy)."""
+    proxy = apiproxy_stub_map.apiproxy
+    if proxy not in _hook_installed:
+        proxy.GetPreCallHooks().Append('instrumentation', _count_call)
+        _hook_installed[:] = [proxy]
+
+
+def _record(method, elapsed_ms, calls):
+    """Add a call to the pending histogram counters, flushing if due."""
+    window = int(time.time()) // WINDOW_SECONDS
+    bucket = bisect.bisect_left(BUCKETS_MS, elapsed_ms)
+    with _pending_lock:
+        _pending[MEMCACHE_STATS_KEY.format(method, window, bucket)] += 1
+        _pending[MEMCACHE_STATS_KEY.format(method, window, 'ms')] += int(
+            elapsed_ms)
+        for name, count in calls.items():
+            _pending[MEMCACHE_STATS_KEY.format(method, window, name)] += count
+        if time.time() - _last_flush[0] < FLUSH_SECONDS:
+            return
+        pending = dict(_pending)
+        _pending.clear()
+        _last_flush[0] = time.time()
+
+    # One memcache call per instance per FLUSH_SECONDS, not one per request
+    memcache.offset_multi(pending, initial_value=0)
+
+
+def instrumented(method):
+    """Decorate an endpoint method to count its API calls and time it.
+
+    Apply below `endpoints.method` so the endpoint wraps the timed method.
+    """
+    if not INSTRUMENT_ENDPOINTS:
+        return method
+
+    @functools.wraps(method)
+    def wrapper(self, request):
+        if getattr(_request, 'calls', None) is not None:
+            # Already inside an instrumented method
+            return method(self, request)
+
+        _install_hook()
+        _request.calls = collections.Counter()
+        start = time.time()
+        status = 'ok'
+        try:
+            return method(self, request)
+        except Exception as error:
+            status = type(error).__name__
+            raise
+        finally:
+            elapsed_ms = (time.time() - start) * 1000
+            calls, _request.calls = _request.calls, None
+            logging.info('endpoint_stats %s', json.dumps({
+                'method': method.__name__,
+                'status': status,
+                'wall_ms': round(elapsed_ms, 3),
+                'calls': calls,
+            }, sort_keys=True))
+            _record(method.__name__, elapsed_ms, calls)
+
+    return wrapper
+
+
+def _percentile(histogram, total, fraction):
+    """Bucket upper bound (ms) below which `fraction` of calls fall."""
+    running = 0
+    for bucket, count in enumerate(histogram):
+        running += count
+        if running >= fraction * total:
+            return BUCKETS_MS[bucket] if bucket < len(BUCKETS_MS) else None
+
+
+def get_stats(methods):
+    """Summarize the last WINDOWS_KEPT windows of stats for `methods`.
+
+    Percentiles are the upper bound of the histogram bucket they fall in
+    (None if above the largest bound).
+    """
+    current = int(time.time()) // WINDOW_SECONDS
+    windows = range(current - WINDOWS_KEPT + 1, current + 1)
+    counters = range(len(BUCKETS_MS) + 1) + ['ms'] + list(REPORTED_CALLS)
+    values = memcache.get_multi([
+        MEMCACHE_STATS_KEY.format(method, window, counter) for
+        method in methods for window in windows for counter in counters])
+
+    def total(method, counter):
+        return sum(values.get(MEMCACHE_STATS_KEY.format(
+            method, window, counter), 0) for window in windows)
+
+    stats = {}
+    for method in methods:
+        histogram = [total(method, bucket) for
+                     bucket in range(len(BUCKETS_MS) + 1)]
+        calls = sum(histogram)
+        if not calls:
+            continue
+        stats[method] = {
+            'calls': calls,
+            'mean_ms': float(total(method, 'ms')) / calls,
+            'p50_ms': _percentile(histogram, calls, 0.50),
+            'p95_ms': _percentile(histogram, calls, 0.95),
+            'p99_ms': _percentile(histogram, calls, 0.99),
+            'api_calls_per_request': dict(
+                (name, float(total(method, name)) / calls) for
+                name in REPORTED_CALLS),
+        }
+    return stats
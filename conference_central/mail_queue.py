@@ -0,0 +1,183 @@
+"""Queued, batched email for Conference Central.
+
+`enqueue` stores an `OutboundEmail` and adds it to the `mail` pull queue,
+and one push task per `SEND_INTERVAL` drains the queue. `send_pending`
+leases queued emails in batches and merges those from the same template to
+the same recipient into one email, so creating many conferences sends one
+confirmation. Each merged email is rendered once, and at most
+`SENDS_PER_SECOND` are sent. A send that fails transiently is retried with
+exponential backoff (by extending its task's lease), up to `MAX_ATTEMPTS`.
+The status of every email, and its last error, is recorded.
+"""
+
+import collections
+from datetime import datetime
+import string
+import time
+
+from google.appengine.api import app_identity
+from google.appengine.api import mail
+from google.appengine.api import taskqueue
+from google.appengine.ext import ndb
+from google.appengine.runtime import apiproxy_errors
+
+from models import OutboundEmail
+
+QUEUE_NAME = 'mail'
+SEND_INTERVAL = 10  # seconds
+BATCH_SIZE = 100
+LEASE_SECONDS = 60
+# Batches per push task; another task continues if there are more
+MAX_BATCHES = 10
+SENDS_PER_SECOND = 5
+MAX_ATTEMPTS = 5
+BACKOFF_SECONDS = 30  # doubled on each further attempt
+# Errors the mail service doesn't map to a mail.Error are internal ones
+TRANSIENT_ERRORS = (apiproxy_errors.ApplicationError,
+                    apiproxy_errors.DeadlineExceededError,
+                    apiproxy_errors.OverQuotaError)
+
+TEMPLATES = {
+    'conference_created': {
+        'subject': string.Template('You created ${count} new conference(s)!'),
+        'body': string.Template(
+            'Hi, you have created the following conference(s):'
+            '\r\n\r\n${items}'),
+        'item': string.Template(
+            '${name}\r\nCity: ${city}\r\nDates: ${startDate} - ${endDate}'),
+    },
+}
+
+
+def _render(template_name, items):
+    """Render an email (subject, body) listing items (template parameters)."""
+    template = TEMPLATES[template_name]
+    return (
+        template['subject'].safe_substitute(count=len(items)),
+        template['body'].safe_substitute(items='\r\n\r\n'.join(
+            template['item'].safe_substitute(item) for item in items)))
+
+
+def schedule_send(countdown=0):
+    """Drain the queue in (at least) `countdown` seconds, once per interval."""
+    due = time.time() + countdown
+    bucket = int(due) // SEND_INTERVAL
+    try:
+        # Runs after the interval ends, so emails queued during it are
+        # sent together
+        taskqueue.add(
+            name='send-mail-{0}'.format(bucket),
+            countdown=max(0, (bucket + 1) * SEND_INTERVAL - time.time()),
+            url='/tasks/send_mail')
+    except (taskqueue.TaskAlreadyExistsError, taskqueue.TombstonedTaskError):
+        pass
+
+
+def enqueue(template_name, to, items):
+    """Queue an email listing items (template parameters), returning it."""
+    email = OutboundEmail(template=template_name, to=to, items=items)
+    email.put()
+    taskqueue.Queue(QUEUE_NAME).add(taskqueue.Task(
+        payload=email.key.urlsafe(), method='PULL'))
+    schedule_send()
+    return email
+
+
+class _RateLimiter(object):
+
+    """Spaces out calls to at most `per_second` a second."""
+
+    def __init__(self, per_second):
+        self.interval = 1.0 / per_second
+        self.last = 0
+
+    def wait(self):
+        """Sleep until the next call is allowed."""
+        delay = self.last + self.interval - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        self.last = time.time()
+
+
+def _send_batch(queue, tasks, rate_limiter):
+    """Send a batch of leased emails.
+
+    Returns (emails sent, seconds until the first retry is due or None).
+    """
+    emails = ndb.get_multi([ndb.Key(urlsafe=task.payload) for task in tasks])
+    merged = collections.OrderedDict()
+    done = []
+    for task, email in zip(tasks, emails):
+        if email and email.status == OutboundEmail.PENDING:
+            merged.setdefault((email.template, email.to), []).append(
+                (task, email))
+        else:
+            # Gone, or sent before a lease expired
+            done.append(task)
+
+    sender = 'noreply@%s.appspotmail.com' % app_identity.get_application_id()
+    sent = 0
+    retry_in = None
+    for (template_name, to), group in merged.items():
+        subject, body = _render(template_name, [
+            item for _, email in group for item in email.items or []])
+        rate_limiter.wait()
+        error = None
+        try:
+            mail.send_mail(sender, to, subject, body)
+        except TRANSIENT_ERRORS as transient_error:
+            error, retry = transient_error, True
+        except mail.Error as permanent_error:
+            # e.g. an invalid address; no point retrying
+            error, retry = permanent_error, False
+
+        for task, email in group:
+            email.attempts += 1
+            email.error = repr(error) if error else None
+            if error is None:
+                email.status = OutboundEmail.SENT
+                email.sent = datetime.now()
+                sent += 1
+                done.append(task)
+            elif retry and email.attempts < MAX_ATTEMPTS:
+                delay = BACKOFF_SECONDS * 2 ** (email.attempts - 1)
+                # The task is leased again once the delay is over
+                queue.modify_task_lease(task, delay)
+                retry_in = delay if retry_in is None else min(retry_in, delay)
+            else:
+                email.status = OutboundEmail.FAILED
+                done.append(task)
+
+    ndb.put_multi([email for group in merged.values() for _, email in group])
+    if done:
+        queue.delete_tasks(done)
+    return sent, retry_in
+
+
+def send_pending():
+    """Send queued emails a batch at a time, returning how many were sent."""
+    queue = taskqueue.Queue(QUEUE_NAME)
+    rate_limiter = _RateLimiter(SENDS_PER_SECOND)
+    sent = 0
+    retries = []
+    for _ in range(MAX_BATCHES):
+        tasks = queue.lease_tasks(LEASE_SECONDS, BATCH_SIZE)
+        if not tasks:
+            break
+        try:
+            batch_sent, retry_in = _send_batch(queue, tasks, rate_limiter)
+        except Exception:
+            # Some of the batch may have been sent, so don't hand it straight
+            # back; drain again once the leases have run out
+            schedule_send(LEASE_SECONDS)
+            raise
+        sent += batch_sent
+        if retry_in is not None:
+            retries.append(retry_in)
+    else:
+        # Leave the rest of the queue to another task
+        schedule_send()
+
+    if retries:
+        schedule_send(min(retries))
+    return sent
@@ -12,25 +12,61 @@ created by wesc on 2014 may 24
 
 __author__ = 'wesc+api@google.com (Wesley Chun)'
 
+import csv
+from datetime import datetime
+from datetime import timedelta
+import json
+import StringIO
+
 import webapp2
 from google.appengine.api import app_identity
 from google.appengine.api import mail
-from google.appengine.api import memcache
+from google.appengine.api import taskqueue
+from google.appengine.datastore.datastore_query import Cursor
 from google.appengine.ext import ndb
 
-from conference import ConferenceApi, MEMCACHE_FEATURED_SPEAKER
+# Modules only some handlers need (endpoints and the Endpoints service, the
+# Search API, the bulk importer) are imported by those handlers, so that
+# loading requests on the task & cron instance stay cheap
+import announcements
+import entity_cache
+import featured_speakers
+import instrumentation
+import mail_queue
+from models import Conference
+from models import Profile
 from models import Session
+import registration_queue
+import registrations
+import seat_counter
+import session_queries
 
 class SetAnnouncementHandler(webapp2.RequestHandler):
     def get(self):
-        """Set Announcement in Memcache."""
-        ConferenceApi._cacheAnnouncement()
+        """Check the nearly sold out conferences & recache Announcement."""
+        # conferences are listed as registrations commit; only those listed
+        # and those whose seats changed lately are checked (see
+        # announcements.py)
+        conf_keys = announcements.get_conference_keys()
+        conf_keys.extend(
+            conf_key for conf_key in seat_counter.get_changed_conference_keys(
+                datetime.utcnow() - timedelta(
+                    hours=announcements.RECONCILE_HOURS),
+                announcements.MAX_RECONCILED)
+            if conf_key not in conf_keys)
+        conferences = [conf for conf in ndb.get_multi(conf_keys) if conf]
+        # summed from the shards; a cached total may have drifted
+        announcements.reconcile(
+            conferences, seat_counter.get_counts(conferences, fresh=True))
         self.response.set_status(204)
 
 
 class SendConfirmationEmailHandler(webapp2.RequestHandler):
     def post(self):
-        """Send email confirming Conference creation."""
+        """Send email confirming Conference creation.
+
+        Only for tasks queued before emails went through mail_queue.
+        """
         mail.send_mail(
             'noreply@%s.appspotmail.com' % (
                 app_identity.get_application_id()),     # from
@@ -45,28 +81,293 @@ class SendConfirmationEmailHandler(webapp2.RequestHandler):
 # begin: brenj additions to main.py
 ###################################
 
+class SendMail(webapp2.RequestHandler):
+
+    """Handle sending queued emails."""
+
+    def post(self):
+        """Send the queued emails, a batch at a time."""
+        mail_queue.send_pending()
+
+
 class StoreFeaturedSpeaker(webapp2.RequestHandler):
 
     """Handle storing a featured speaker."""
 
     def post(self):
-        """Store a featured speaker in memcache if meets requirements."""
-        conference = ndb.Key(urlsafe=self.request.get('conference_key')).get()
-        speaker = ndb.Key(urlsafe=self.request.get('speaker_key')).get()
-
-        # Ancestor query means we get strongly-consistent results, which we
-        # need because we just put a new session by this speaker
-        conference_sessions_by_speaker = (
-            Session.query(ancestor=conference.key).filter(
-                Session.speaker_key == speaker.key).fetch(
-                projection=[Session.name]))
-
-        if len(conference_sessions_by_speaker) > 1:
-            session_names = [session.name for session in
-                             conference_sessions_by_speaker]
-            featured_speaker_message = "{0}: {1}".format(
-                speaker.name, ', '.join(session_names))
-            memcache.set(MEMCACHE_FEATURED_SPEAKER, featured_speaker_message)
+        """Store the conference's featured speaker in memcache."""
+        featured_speakers.update(
+            ndb.Key(urlsafe=self.request.get('conference_key')))
+
+
+class IndexConference(webapp2.RequestHandler):
+
+    """Handle (re)indexing a conference for search."""
+
+    def post(self):
+        """Index the conference with its sessions and speakers."""
+        import conference_search
+        conference_search.index(
+            [ndb.Key(urlsafe=self.request.get('conference_key'))])
+
+
+class ProcessRegistrations(webapp2.RequestHandler):
+
+    """Handle applying queued conference registrations."""
+
+    def post(self):
+        """Register users queued for a conference, a batch at a time."""
+        registration_queue.process(
+            ndb.Key(urlsafe=self.request.get('conference_key')))
+
+
+class UpdateAnnouncement(webapp2.RequestHandler):
+
+    """Handle applying queued nearly sold out checks."""
+
+    def post(self):
+        """Update the nearly sold out conferences, a batch at a time."""
+        announcements.process()
+
+
+MIGRATION_BATCH_SIZE = 100
+
+
+def copy_organizer_display_names(query, url, params):
+    """Copy organizer display names onto a batch of `query` conferences.
+
+    Another task (to `url`, with `params`) is queued for the next batch
+    until the query is exhausted.
+    """
+    cursor = params.get('cursor')
+    conferences, next_cursor, more = query.fetch_page(
+        MIGRATION_BATCH_SIZE,
+        start_cursor=Cursor(urlsafe=cursor) if cursor else None)
+
+    organizer_keys = list(set(conf.key.parent() for conf in conferences))
+    names = dict((profile.key, profile.displayName) for profile in
+                 ndb.get_multi(organizer_keys) if profile)
+
+    changed = []
+    for conference in conferences:
+        display_name = names.get(conference.key.parent())
+        if conference.organizerDisplayName != display_name:
+            conference.organizerDisplayName = display_name
+            changed.append(conference)
+    ndb.put_multi(changed)
+    for conference in changed:
+        entity_cache.bump_version(conference.key)
+
+    if more and next_cursor:
+        params = dict(params, cursor=next_cursor.urlsafe())
+        taskqueue.add(params=params, url=url)
+
+
+class SyncOrganizerDisplayName(webapp2.RequestHandler):
+
+    """Handle copying an organizer's display name onto their conferences."""
+
+    def post(self):
+        """Update a batch of the organizer's conferences."""
+        user_id = self.request.get('user_id')
+        copy_organizer_display_names(
+            Conference.query(ancestor=ndb.Key(Profile, user_id)),
+            self.request.path,
+            {'user_id': user_id, 'cursor': self.request.get('cursor')})
+
+
+class BackfillOrganizerDisplayNames(webapp2.RequestHandler):
+
+    """One-off migration storing organizer display names on conferences."""
+
+    def get(self):
+        """Start the backfill (e.g. by an admin visiting the URL)."""
+        taskqueue.add(url=self.request.path)
+        self.response.set_status(202)
+
+    def post(self):
+        """Backfill a batch of conferences."""
+        copy_organizer_display_names(
+            Conference.query(), self.request.path,
+            {'cursor': self.request.get('cursor')})
+
+
+class BackfillSessionTypes(webapp2.RequestHandler):
+
+    """One-off migration storing `is_workshop` & registering session types."""
+
+    def get(self):
+        """Start the backfill (e.g. by an admin visiting the URL)."""
+        taskqueue.add(url=self.request.path)
+        self.response.set_status(202)
+
+    def post(self):
+        """Re-save a batch of sessions, queueing the next batch."""
+        cursor = self.request.get('cursor')
+        sessions, next_cursor, more = Session.query().fetch_page(
+            MIGRATION_BATCH_SIZE,
+            start_cursor=Cursor(urlsafe=cursor) if cursor else None)
+
+        # Putting stores the computed properties
+        ndb.put_multi(sessions)
+        for type_of_session in set(
+                session.type_of_session for session in sessions):
+            session_queries.register_session_type(type_of_session)
+
+        if more and next_cursor:
+            taskqueue.add(params={'cursor': next_cursor.urlsafe()},
+                          url=self.request.path)
+
+
+class IndexConferences(webapp2.RequestHandler):
+
+    """One-off migration adding existing conferences to the search index."""
+
+    def get(self):
+        """Start the indexing (e.g. by an admin visiting the URL)."""
+        taskqueue.add(url=self.request.path)
+        self.response.set_status(202)
+
+    def post(self):
+        """Index a batch of conferences, queueing the next batch."""
+        import conference_search
+        cursor = self.request.get('cursor')
+        conference_keys, next_cursor, more = Conference.query().fetch_page(
+            MIGRATION_BATCH_SIZE, keys_only=True,
+            start_cursor=Cursor(urlsafe=cursor) if cursor else None)
+
+        conference_search.index(conference_keys)
+
+        if more and next_cursor:
+            taskqueue.add(params={'cursor': next_cursor.urlsafe()},
+                          url=self.request.path)
+
+
+class BuildAnnouncement(webapp2.RequestHandler):
+
+    """One-off migration listing existing nearly sold out conferences."""
+
+    def get(self):
+        """Start the migration (e.g. by an admin visiting the URL)."""
+        taskqueue.add(url=self.request.path)
+        self.response.set_status(202)
+
+    def post(self):
+        """List a batch of conferences, queueing the next batch."""
+        cursor = self.request.get('cursor')
+        conferences, next_cursor, more = Conference.query().fetch_page(
+            MIGRATION_BATCH_SIZE,
+            start_cursor=Cursor(urlsafe=cursor) if cursor else None)
+
+        announcements.update(
+            conferences, seat_counter.get_counts(conferences))
+
+        if more and next_cursor:
+            taskqueue.add(params={'cursor': next_cursor.urlsafe()},
+                          url=self.request.path)
+
+
+class MigrateRegistrations(webapp2.RequestHandler):
+
+    """One-off migration of profile registration lists to Registrations."""
+
+    def get(self):
+        """Start the migration (e.g. by an admin visiting the URL)."""
+        taskqueue.add(url=self.request.path)
+        self.response.set_status(202)
+
+    def post(self):
+        """Migrate a batch of profiles, queueing the next batch."""
+        cursor = self.request.get('cursor')
+        profile_keys, next_cursor, more = Profile.query().fetch_page(
+            MIGRATION_BATCH_SIZE, keys_only=True,
+            start_cursor=Cursor(urlsafe=cursor) if cursor else None)
+
+        # One transaction per profile, so registrations made (or removed)
+        # while migrating aren't lost
+        for profile_key in profile_keys:
+            registrations.migrate_profile(profile_key)
+
+        if more and next_cursor:
+            taskqueue.add(params={'cursor': next_cursor.urlsafe()},
+                          url=self.request.path)
+
+
+def _import_rows(rows):
+    """Get imported rows as dicts of strings, or None if they aren't flat."""
+    if not isinstance(rows, list) or not all(
+            isinstance(row, dict) for row in rows):
+        return None
+    if not all(value is None or isinstance(value, (basestring, int, float))
+               for row in rows for value in row.values()):
+        return None
+    # e.g. JSON durations may be numbers
+    return [dict((name, value if value is None or
+                  isinstance(value, basestring) else unicode(value))
+                 for name, value in row.items()) for row in rows]
+
+
+class ImportSessionsHandler(webapp2.RequestHandler):
+
+    """Admin-only offline import of a conference's sessions and speakers.
+
+    POST the sessions as CSV (with a header row) or as JSON (a list of
+    objects, Content-Type: application/json) to
+    /admin/import_sessions?conference=<websafe conference key>. Fields are
+    those of SessionRequestMessage, except a `speaker` name may be given
+    instead of a `speaker_key`.
+    """
+
+    def post(self):
+        """Import the posted sessions, all or none."""
+        import endpoints
+        import bulk_import
+        try:
+            conference_key = ndb.Key(urlsafe=self.request.get('conference'))
+        except Exception:
+            # All kinds of errors can happen with user-provided keys
+            conference_key = None
+        if (not conference_key or
+                conference_key.kind() != Conference._get_kind()):
+            self.abort(400, detail='Invalid conference key.')
+        conference = conference_key.get()
+        if not conference:
+            self.abort(404, detail='No conference found.')
+
+        try:
+            if self.request.content_type == 'application/json':
+                rows = json.loads(self.request.body)
+            else:
+                rows = list(csv.DictReader(
+                    StringIO.StringIO(self.request.body)))
+        except (ValueError, csv.Error) as error:
+            self.abort(400, detail='Invalid sessions: {0}'.format(error))
+        rows = _import_rows(rows)
+        if rows is None:
+            self.abort(400, detail='Sessions must be a list of objects of '
+                                   'strings and numbers.')
+
+        try:
+            sessions = bulk_import.import_sessions(conference, rows)
+        except endpoints.BadRequestException as error:
+            self.abort(400, detail=str(error))
+
+        self.response.headers['Content-Type'] = 'application/json'
+        self.response.write(json.dumps(
+            {'sessions': [session.key.urlsafe() for session in sessions]}))
+
+
+class EndpointStatsHandler(webapp2.RequestHandler):
+
+    """Admin-only report of rolling per-endpoint latency & API call stats."""
+
+    def get(self):
+        """Return stats for every ConferenceApi method as JSON."""
+        from conference import ConferenceApi
+        stats = instrumentation.get_stats(
+            sorted(ConferenceApi.all_remote_methods()))
+        self.response.headers['Content-Type'] = 'application/json'
+        self.response.write(json.dumps(stats, indent=2, sort_keys=True))
 
 # end: brenj additions to main.py
 #################################
@@ -75,5 +376,18 @@ class StoreFeaturedSpeaker(webapp2.RequestHandler):
 app = webapp2.WSGIApplication([
     ('/crons/set_announcement', SetAnnouncementHandler),
     ('/tasks/send_confirmation_email', SendConfirmationEmailHandler),
-    ('/tasks/store_featured_speaker', StoreFeaturedSpeaker)
+    ('/tasks/send_mail', SendMail),
+    ('/tasks/store_featured_speaker', StoreFeaturedSpeaker),
+    ('/tasks/index_conference', IndexConference),
+    ('/tasks/process_registrations', ProcessRegistrations),
+    ('/tasks/update_announcement', UpdateAnnouncement),
+    ('/tasks/sync_organizer_display_name', SyncOrganizerDisplayName),
+    ('/migrations/backfill_organizer_display_names',
+     BackfillOrganizerDisplayNames),
+    ('/migrations/backfill_session_types', BackfillSessionTypes),
+    ('/migrations/index_conferences', IndexConferences),
+    ('/migrations/migrate_registrations', MigrateRegistrations),
+    ('/migrations/build_announcement', BuildAnnouncement),
+    ('/admin/import_sessions', ImportSessionsHandler),
+    ('/admin/stats', EndpointStatsHandler)
 ], debug=True)
@@ -12,23 +12,26 @@ created/forked from conferences.py by wesc on 2014 may 24
 
 __author__ = 'wesc+api@google.com (Wesley Chun)'
 
-import httplib
-import endpoints
 from protorpc import messages, message_types
 from google.appengine.ext import ndb
 
-class ConflictException(endpoints.ServiceException):
-    """ConflictException -- exception mapped to HTTP 409 response"""
-    http_status = httplib.CONFLICT
+import serializers
 
 class Profile(ndb.Model):
     """Profile -- User profile object"""
     displayName = ndb.StringProperty()
     mainEmail = ndb.StringProperty()
     teeShirtSize = ndb.StringProperty(default='NOT_SPECIFIED')
+    # Legacy; registrations are `Registration` entities (see registrations)
     conferenceKeysToAttend = ndb.StringProperty(repeated=True)
     sessions_wishlist = ndb.KeyProperty(kind='Session', repeated=True)
 
+    def _post_put_hook(self, future):
+        """Invalidate the cached profile (see profile_cache)."""
+        # imported here as profile_cache imports models
+        import profile_cache
+        profile_cache.invalidate_profile(self.key.id())
+
 class ProfileMiniForm(messages.Message):
     """ProfileMiniForm -- update Profile form message"""
     displayName = messages.StringField(1)
@@ -61,6 +64,7 @@ class Conference(ndb.Model):
     endDate         = ndb.DateProperty()
     maxAttendees    = ndb.IntegerProperty()
     seatsAvailable  = ndb.IntegerProperty()
+    organizerDisplayName = ndb.StringProperty(indexed=False)
 
 class ConferenceForm(messages.Message):
     """ConferenceForm -- Conference outbound form message"""
@@ -80,6 +84,7 @@ class ConferenceForm(messages.Message):
 class ConferenceForms(messages.Message):
     """ConferenceForms -- multiple Conference outbound form message"""
     items = messages.MessageField(ConferenceForm, 1, repeated=True)
+    nextPageToken = messages.StringField(2)
 
 class TeeShirtSize(messages.Enum):
     """TeeShirtSize -- t-shirt size enumeration value"""
@@ -108,6 +113,8 @@ class ConferenceQueryForm(messages.Message):
 class ConferenceQueryForms(messages.Message):
     """ConferenceQueryForms -- multiple ConferenceQueryForm inbound form message"""
     filters = messages.MessageField(ConferenceQueryForm, 1, repeated=True)
+    pageSize = messages.IntegerField(2)
+    pageToken = messages.StringField(3)
 
 # begin: brenj additions to models.py
 #####################################
@@ -128,6 +135,20 @@ class SpeakerResponseMessage(messages.Message):
     name = messages.StringField(2, required=True)
 
 
+class SpeakersRequestMessage(messages.Message):
+
+    """ProtoRPC request message for a collection of speakers."""
+
+    speakers = messages.MessageField(SpeakerRequestMessage, 1, repeated=True)
+
+
+class SpeakersResponseMessage(messages.Message):
+
+    """ProtoRPC response message for a collection of speakers."""
+
+    speakers = messages.MessageField(SpeakerResponseMessage, 1, repeated=True)
+
+
 class SessionRequestMessage(messages.Message):
 
     """ProtoRPC request message for a session."""
@@ -141,6 +162,13 @@ class SessionRequestMessage(messages.Message):
     start_time = messages.StringField(7, required=True)
 
 
+class SessionsRequestMessage(messages.Message):
+
+    """ProtoRPC request message for a collection of sessions."""
+
+    sessions = messages.MessageField(SessionRequestMessage, 1, repeated=True)
+
+
 class SessionResponseMessage(messages.Message):
 
     """ProtoRPC response message for a session."""
@@ -160,6 +188,7 @@ class SessionsResponseMessage(messages.Message):
     """ProtoRPC message for a collection of sessions."""
 
     sessions = messages.MessageField(SessionResponseMessage, 1, repeated=True)
+    next_page_token = messages.StringField(2)
 
 
 class Speaker(ndb.Model):
@@ -170,7 +199,7 @@ class Speaker(ndb.Model):
 
     def to_message(self):
         """Convert a ndb speaker to a speaker response message."""
-        return SpeakerResponseMessage(id=self.key.urlsafe(), name=self.name)
+        return serializers.serialize(self, SpeakerResponseMessage)
 
     def session_set(self):
         """Set of sessions speaker is participating in."""
@@ -188,15 +217,226 @@ class Session(ndb.Model):
     type_of_session = ndb.StringProperty(default='talk')
     date = ndb.DateProperty(required=True)
     start_time = ndb.TimeProperty(required=True)
+    # Lets "not a workshop" be an equality filter (see session_queries)
+    is_workshop = ndb.ComputedProperty(
+        lambda self: self.type_of_session == 'workshop')
+
+    def to_message(self, speaker=None):
+        """Convert a ndb session to a session message.
+
+        `speaker` may be passed in when it has already been fetched (e.g. by
+        `to_messages`) to avoid a datastore get per session.
+        """
+        if speaker is None:
+            speaker = self.speaker_key.get()
+        return serializers.serialize(
+            self, SessionResponseMessage, speaker=speaker.to_message())
+
+    @classmethod
+    def to_messages(cls, sessions):
+        """Convert ndb sessions to a sessions response message.
+
+        Speakers are resolved with a single `ndb.get_multi` over the distinct
+        speaker keys, so the number of speaker lookups is constant no matter
+        how many sessions are being converted.
+        """
+        return cls.to_messages_async(sessions).get_result()
+
+    @classmethod
+    @ndb.tasklet
+    def to_messages_async(cls, sessions):
+        """Tasklet version of `to_messages` (returns a Future)."""
+        sessions = [session for session in sessions if session]
+        speaker_keys = list(set(session.speaker_key for session in sessions))
+        speakers = yield ndb.get_multi_async(speaker_keys)
+        speakers = dict(zip(speaker_keys, speakers))
+
+        raise ndb.Return(SessionsResponseMessage(
+            sessions=[session.to_message(speakers[session.speaker_key]) for
+                      session in sessions]))
+
+
+class SessionType(ndb.Model):
+
+    """A type of session in use (e.g. talk); the key id is the type."""
+
+
+class SeatShard(ndb.Model):
+
+    """One shard of a conference's available seats (see `seat_counter`)."""
+
+    seats = ndb.IntegerProperty(default=0, indexed=False)
+    # Lets the announcement cron find conferences whose seats changed
+    updated = ndb.DateTimeProperty(auto_now=True)
+
+
+class NearlySoldOut(ndb.Model):
+
+    """The nearly sold out conferences (see `announcements`)."""
+
+    # Conference url-safe key -> conference name
+    names = ndb.JsonProperty()
+
+
+class ConferenceSpeakers(ndb.Model):
+
+    """Session names by speaker for a conference (see `featured_speakers`)."""
+
+    # Speaker url-safe key -> names of the speaker's sessions
+    session_names = ndb.JsonProperty()
+
+
+class ConferenceSchedule(ndb.Model):
+
+    """A conference's compressed session schedule (see `schedules`)."""
+
+    data = ndb.BlobProperty()
+
+
+class RegistrationTicketMessage(messages.Message):
+
+    """ProtoRPC response message for a queued conference registration."""
+
+    id = messages.StringField(1, required=True)
+    conference = messages.StringField(2, required=True)
+    status = messages.StringField(3, required=True)
+    message = messages.StringField(4)
+
+
+class RegistrationTicket(ndb.Model):
+
+    """A queued request to register for a `Conference` (child of `Profile`)."""
+
+    PENDING = 'PENDING'
+    REGISTERED = 'REGISTERED'
+    REJECTED = 'REJECTED'
+
+    conference_key = ndb.KeyProperty(kind='Conference', required=True)
+    status = ndb.StringProperty(default=PENDING)
+    message = ndb.StringProperty(indexed=False)
+    created = ndb.DateTimeProperty(auto_now_add=True)
 
     def to_message(self):
-        """Convert a ndb session to a session message."""
-        speaker = self.speaker_key.get()
-        return SessionResponseMessage(
-            id=self.key.urlsafe(), name=self.name, highlights=self.highlights,
-            speaker=speaker.to_message(), duration=self.duration,
-            type_of_session=self.type_of_session, date=str(self.date),
-            start_time=str(self.start_time))
+        """Convert a ndb registration ticket to a ticket message."""
+        return RegistrationTicketMessage(
+            id=self.key.urlsafe(), conference=self.conference_key.urlsafe(),
+            status=self.status, message=self.message)
+
+
+class OutboundEmail(ndb.Model):
+
+    """A queued email and its delivery status (see `mail_queue`)."""
+
+    PENDING = 'PENDING'
+    SENT = 'SENT'
+    FAILED = 'FAILED'
+
+    template = ndb.StringProperty(required=True)
+    to = ndb.StringProperty(required=True)
+    # Template parameters of each item listed in the email
+    items = ndb.JsonProperty()
+    status = ndb.StringProperty(default=PENDING)
+    attempts = ndb.IntegerProperty(default=0, indexed=False)
+    error = ndb.StringProperty(indexed=False)
+    created = ndb.DateTimeProperty(auto_now_add=True)
+    sent = ndb.DateTimeProperty()
+
+
+class Registration(ndb.Model):
+
+    """A user's registration for a `Conference` (see `registrations`).
+
+    A child of the attendee's `Profile`, with the conference's url-safe key
+    as its id, so whether a user is registered is a get and their
+    registrations an ancestor query; `conference` is indexed for listing a
+    conference's attendees.
+    """
+
+    conference = ndb.KeyProperty(kind='Conference', required=True)
+    created = ndb.DateTimeProperty(auto_now_add=True)
+
+    def _post_put_hook(self, future):
+        """Invalidate the attendee's cached registrations (profile_cache)."""
+        # Imported here as profile_cache imports this module
+        import profile_cache
+        profile_cache.invalidate_registrations(self.key.parent().id())
+
+    @classmethod
+    def _post_delete_hook(cls, key, future):
+        """Invalidate the attendee's cached registrations (profile_cache)."""
+        import profile_cache
+        profile_cache.invalidate_registrations(key.parent().id())
+
+
+class ConferenceFeed(messages.Enum):
+
+    """Conferences listed by a conference feed (see `conference_feeds`)."""
+
+    ALL = 1
+    CREATED = 2
+    ATTENDING = 3
+
+
+class ConferenceSort(messages.Enum):
+
+    """Orders of a conference feed."""
+
+    START_DATE = 1
+    SEATS_AVAILABLE = 2
+    NAME = 3
+
+
+class ConferenceFeedRequestMessage(messages.Message):
+
+    """ProtoRPC request message for a page of a conference feed.
+
+    `filters` only apply to the ALL feed; pages are numbered from 0.
+    """
+
+    feed = messages.EnumField(ConferenceFeed, 1, default='ALL')
+    filters = messages.MessageField(ConferenceQueryForm, 2, repeated=True)
+    sort = messages.EnumField(ConferenceSort, 3, default='START_DATE')
+    page = messages.IntegerField(4, default=0)
+    page_size = messages.IntegerField(5)
+
+
+class ConferenceFeedResponseMessage(messages.Message):
+
+    """ProtoRPC response message for a page of a conference feed."""
+
+    # Organizer names are included (as organizerDisplayName)
+    items = messages.MessageField(ConferenceForm, 1, repeated=True)
+    total_count = messages.IntegerField(2, required=True)
+    page = messages.IntegerField(3, required=True)
+    page_size = messages.IntegerField(4, required=True)
+    # Only the first conference_feeds.MAX_FEED_SIZE are listed
+    truncated = messages.BooleanField(5, default=False)
+
+
+class AttendeesResponseMessage(messages.Message):
+
+    """ProtoRPC response message for (a page of) a conference's attendees."""
+
+    attendees = messages.MessageField(ProfileForm, 1, repeated=True)
+    count = messages.IntegerField(2, required=True)
+    next_page_token = messages.StringField(3)
+
+
+# Entity to message mappings, planned once here rather than per entity
+serializers.register(
+    Conference, ConferenceForm, websafeKey=lambda conf: conf.key.urlsafe())
+serializers.register(
+    Profile, ProfileForm,
+    teeShirtSize=lambda prof: TeeShirtSize.lookup_by_name(prof.teeShirtSize))
+serializers.register(
+    Speaker, SpeakerResponseMessage,
+    id=lambda speaker: speaker.key.urlsafe())
+serializers.register(
+    Session, SessionResponseMessage,
+    id=lambda session: session.key.urlsafe(),
+    # Stored as minutes, sent as a string
+    duration=lambda session: (
+        str(session.duration) if session.duration is not None else None))
 
 
 # end: brenj additions to models.py
@@ -0,0 +1,112 @@
+"""Cache of user profiles and their registrations for Conference Central.
+
+A `ProfileCache` serves a user's `Profile`, and the keys of the conferences
+they're registered for, by user id from two tiers: in process for one
+request (`ConferenceApi` keeps one per instance, i.e. per request) and
+serialized in memcache across requests. The `Profile` and `Registration`
+put and delete hooks call `invalidate_profile` and
+`invalidate_registrations`, so a warm cache saves read-only endpoints every
+datastore call without ever serving a write's old data.
+"""
+
+from google.appengine.api import memcache
+from google.appengine.datastore import entity_pb
+from google.appengine.ext import ndb
+
+from models import Profile
+import registrations
+
+MEMCACHE_PROFILE_KEY = "PROFILE:{0}"
+MEMCACHE_REGISTRATIONS_KEY = "REGISTRATIONS:{0}"
+PROFILE_CACHE_TIME = 3600
+# Readers may get the old data while a write commits; invalidating also
+# keeps them from caching it (memcache adds fail) for this long
+LOCK_SECONDS = 5
+
+_adapter = ndb.ModelAdapter()
+
+
+def _serialize(profile):
+    """Serialize a profile as the datastore stores it."""
+    return _adapter.entity_to_pb(profile).Encode()
+
+
+def _deserialize(data):
+    """Deserialize a profile serialized by `_serialize`."""
+    return _adapter.pb_to_entity(entity_pb.EntityProto(data))
+
+
+def _invalidate(cache_key):
+    """Delete and lock a memcache entry, once committed."""
+    # Outside a transaction the callback runs immediately
+    ndb.get_context().call_on_commit(
+        lambda: memcache.delete(cache_key, seconds=LOCK_SECONDS))
+
+
+def invalidate_profile(user_id):
+    """Invalidate a user's cached profile (on put)."""
+    _invalidate(MEMCACHE_PROFILE_KEY.format(user_id))
+
+
+def invalidate_registrations(user_id):
+    """Invalidate a user's cached registrations (on put or delete)."""
+    _invalidate(MEMCACHE_REGISTRATIONS_KEY.format(user_id))
+
+
+class ProfileCache(object):
+
+    """Profiles and registrations by user id, for one request."""
+
+    def __init__(self):
+        self._profiles = {}
+        self._conference_keys = {}
+
+    def set_profile(self, profile):
+        """Remember a profile just created or updated by this request."""
+        self._profiles[profile.key.id()] = profile
+
+    @ndb.tasklet
+    def get_profile_async(self, user_id):
+        """Get a user's profile (None if they have none); returns a Future."""
+        if user_id not in self._profiles:
+            context = ndb.get_context()
+            cache_key = MEMCACHE_PROFILE_KEY.format(user_id)
+            data = yield context.memcache_get(cache_key)
+            if data is not None:
+                profile = _deserialize(data)
+            else:
+                # ndb's own memcache layer would only duplicate this one
+                profile = yield ndb.Key(Profile, user_id).get_async(
+                    use_memcache=False)
+                if profile:
+                    yield context.memcache_add(
+                        cache_key, _serialize(profile), PROFILE_CACHE_TIME)
+            self._profiles[user_id] = profile
+        raise ndb.Return(self._profiles[user_id])
+
+    @ndb.tasklet
+    def get_conference_keys_async(self, user_id):
+        """Get the keys of the conferences a user is registered for.
+
+        Returns a Future.
+        """
+        if user_id not in self._conference_keys:
+            context = ndb.get_context()
+            cache_key = MEMCACHE_REGISTRATIONS_KEY.format(user_id)
+            conference_keys = yield context.memcache_get(cache_key)
+            if conference_keys is None:
+                conference_keys = yield (
+                    registrations.get_conference_keys_async(
+                        ndb.Key(Profile, user_id)))
+                yield context.memcache_add(
+                    cache_key, conference_keys, PROFILE_CACHE_TIME)
+            self._conference_keys[user_id] = conference_keys
+        raise ndb.Return(self._conference_keys[user_id])
+
+    def get_conference_keys(self, user_id):
+        """Get the keys of the conferences a user is registered for."""
+        return self.get_conference_keys_async(user_id).get_result()
+
+    def forget_conference_keys(self, user_id):
+        """Forget a user's registrations after this request changed them."""
+        self._conference_keys.pop(user_id, None)
@@ -0,0 +1,122 @@
+"""Queued conference registration for Conference Central.
+
+Registrations made through the queue are stored as `RegistrationTicket`s and
+added to the `registrations` pull queue, tagged by conference. One push task
+per conference and `BATCH_INTERVAL` then drains the queue, registering a
+batch of users in one cross-group transaction instead of running one
+contended transaction per user.
+"""
+
+import time
+
+from google.appengine.api import taskqueue
+from google.appengine.ext import ndb
+
+from models import RegistrationTicket
+import registrations
+import seat_counter
+
+QUEUE_NAME = 'registrations'
+BATCH_INTERVAL = 2  # seconds
+# A batch touches the conference, one profile per ticket and possibly every
+# seat shard; cross-group transactions are limited to 25 entity groups
+BATCH_SIZE = 10
+LEASE_SECONDS = 60
+
+
+def enqueue(profile_key, conference_key):
+    """Queue a registration, returning its (pending) ticket."""
+    ticket = RegistrationTicket(parent=profile_key,
+                                conference_key=conference_key)
+    ticket.put()
+
+    wsck = conference_key.urlsafe()
+    taskqueue.Queue(QUEUE_NAME).add(taskqueue.Task(
+        payload=ticket.key.urlsafe(), method='PULL', tag=wsck))
+
+    # Schedule one drain per conference per interval; it runs after the
+    # interval ends so no ticket queued during the interval can be missed
+    bucket = int(time.time()) // BATCH_INTERVAL
+    try:
+        taskqueue.add(
+            name='registrations-{0}-{1}'.format(wsck, bucket),
+            countdown=max(0, (bucket + 1) * BATCH_INTERVAL - time.time()),
+            params={'conference_key': wsck},
+            url='/tasks/process_registrations')
+    except (taskqueue.TaskAlreadyExistsError, taskqueue.TombstonedTaskError):
+        pass
+
+    return ticket
+
+
+@ndb.transactional(xg=True)
+def _register_batch(conference_key, ticket_keys):
+    """Apply a batch of pending tickets for one conference."""
+    conference = conference_key.get()
+    tickets = sorted(
+        [ticket for ticket in ndb.get_multi(ticket_keys) if
+         ticket and ticket.status == RegistrationTicket.PENDING],
+        key=lambda ticket: ticket.created)
+    profile_keys = [ticket.key.parent() for ticket in tickets]
+    entities = ndb.get_multi(profile_keys + [
+        registrations.registration_key(profile_key, conference_key) for
+        profile_key in profile_keys])
+    profiles = entities[:len(tickets)]
+    existing = entities[len(tickets):]
+
+    # Tickets from users that are (or are about to be) registered already
+    wsck = conference_key.urlsafe()
+    accepted = []
+    for ticket, profile, registration in zip(tickets, profiles, existing):
+        if not conference:
+            ticket.status = RegistrationTicket.REJECTED
+            ticket.message = "No conference found with key: {0}".format(wsck)
+        elif not profile:
+            ticket.status = RegistrationTicket.REJECTED
+            ticket.message = "No profile found for this registration."
+        elif (registration or
+              profile.key in [p.key for _, p in accepted]):
+            ticket.status = RegistrationTicket.REJECTED
+            ticket.message = "You have already registered for this conference"
+        else:
+            accepted.append((ticket, profile))
+
+    # Take the seats for the whole batch at once; first come, first served
+    seats = seat_counter.reserve_many(conference, len(accepted)) if accepted else 0
+    registered = []
+    for i, (ticket, profile) in enumerate(accepted):
+        if i < seats:
+            ticket.status = RegistrationTicket.REGISTERED
+            registered.append(
+                registrations.new_registration(profile.key, conference_key))
+        else:
+            ticket.status = RegistrationTicket.REJECTED
+            ticket.message = "There are no seats available."
+
+    ndb.put_multi(tickets + registered)
+
+
+def process(conference_key):
+    """Drain queued registrations for a conference, a batch at a time.
+
+    Returns the number of tickets processed.
+    """
+    queue = taskqueue.Queue(QUEUE_NAME)
+    processed = 0
+    while True:
+        tasks = queue.lease_tasks_by_tag(
+            LEASE_SECONDS, BATCH_SIZE, tag=conference_key.urlsafe())
+        if not tasks:
+            return processed
+
+        try:
+            _register_batch(conference_key, [
+                ndb.Key(urlsafe=task.payload) for task in tasks])
+        except Exception:
+            # Nothing was applied; give the leases back so that the retry
+            # of this (push) task can lease the batch again
+            for task in tasks:
+                queue.modify_task_lease(task, 0)
+            raise
+        queue.delete_tasks(tasks)
+        processed += len(tasks)
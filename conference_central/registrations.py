@@ -0,0 +1,75 @@
+"""Conference registrations for Conference Central.
+
+Each registration is a `Registration` entity under the attendee's `Profile`
+(replacing the legacy `Profile.conferenceKeysToAttend` list of websafe
+strings, which is migrated when a profile is read), so:
+
+* whether a user is registered for a conference is one get,
+* a user's conferences are one (strongly consistent) ancestor query,
+* a conference's attendees are one query on the indexed
+  `Registration.conference` (their count is the seats taken, from
+  seat_counter).
+"""
+
+from google.appengine.ext import ndb
+
+from models import Registration
+
+
+def registration_key(profile_key, conference_key):
+    """Get the key of a user's registration for a conference."""
+    return ndb.Key(Registration, conference_key.urlsafe(), parent=profile_key)
+
+
+def new_registration(profile_key, conference_key):
+    """Make an (unsaved) registration of a user for a conference."""
+    return Registration(key=registration_key(profile_key, conference_key),
+                        conference=conference_key)
+
+
+def is_registered(profile_key, conference_key):
+    """Check whether a user is registered for a conference."""
+    return registration_key(profile_key, conference_key).get() is not None
+
+
+def get_conference_keys(profile_key):
+    """Get the keys of the conferences a user is registered for."""
+    return get_conference_keys_async(profile_key).get_result()
+
+
+@ndb.tasklet
+def get_conference_keys_async(profile_key):
+    """Tasklet version of `get_conference_keys` (returns a Future)."""
+    user_registrations = yield Registration.query(
+        ancestor=profile_key).fetch_async()
+    raise ndb.Return([registration.conference for
+                      registration in user_registrations])
+
+
+def attendees_query(conference_key):
+    """Get a query for a conference's registrations, by attendee."""
+    # Key order is served by the built-in index on `conference`
+    return Registration.query(
+        Registration.conference == conference_key).order(Registration.key)
+
+
+def migrate_profile(profile_key):
+    """Move a profile's legacy registration list to `Registration`s.
+
+    Returns the (updated) profile, or None if there is no such profile.
+    """
+    return migrate_profile_async(profile_key).get_result()
+
+
+@ndb.transactional_tasklet
+def migrate_profile_async(profile_key):
+    """Tasklet version of `migrate_profile` (returns a Future)."""
+    profile = yield profile_key.get_async()
+    if not profile or not profile.conferenceKeysToAttend:
+        raise ndb.Return(profile)
+
+    registrations = [new_registration(profile_key, ndb.Key(urlsafe=wsck))
+                     for wsck in set(profile.conferenceKeysToAttend)]
+    profile.conferenceKeysToAttend = []
+    yield ndb.put_multi_async(registrations + [profile])
+    raise ndb.Return(profile)
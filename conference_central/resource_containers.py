@@ -17,24 +17,51 @@ SESSION_CONFERENCE_REQUEST = endpoints.ResourceContainer(
     models.SessionRequestMessage,
     conference=messages.StringField(1))
 
+SESSIONS_CONFERENCE_REQUEST = endpoints.ResourceContainer(
+    models.SessionsRequestMessage,
+    conference=messages.StringField(1))
+
 CONFERENCE_REQUEST = endpoints.ResourceContainer(
     message_types.VoidMessage,
-    conference=messages.StringField(1))
+    conference=messages.StringField(1),
+    page_size=messages.IntegerField(2),
+    page_token=messages.StringField(3))
 
 SESSIONS_BY_TYPE_REQUEST = endpoints.ResourceContainer(
     message_types.VoidMessage,
     conference=messages.StringField(1),
-    type_of_session=messages.StringField(2))
+    type_of_session=messages.StringField(2),
+    page_size=messages.IntegerField(3),
+    page_token=messages.StringField(4))
 
 SESSIONS_BY_DATE_REQUEST = endpoints.ResourceContainer(
     message_types.VoidMessage,
     conference=messages.StringField(1),
-    date=messages.StringField(2))
+    date=messages.StringField(2),
+    page_size=messages.IntegerField(3),
+    page_token=messages.StringField(4))
 
 SESSIONS_BY_SPEAKER_REQUEST = endpoints.ResourceContainer(
     message_types.VoidMessage,
-    speaker_key=messages.StringField(1))
+    speaker_key=messages.StringField(1),
+    page_size=messages.IntegerField(2),
+    page_token=messages.StringField(3))
+
+SESSIONS_PAGE_REQUEST = endpoints.ResourceContainer(
+    message_types.VoidMessage,
+    page_size=messages.IntegerField(1),
+    page_token=messages.StringField(2))
 
 SESSION_REQUEST = endpoints.ResourceContainer(
     message_types.VoidMessage,
     session=messages.StringField(1))
+
+REGISTRATION_TICKET_REQUEST = endpoints.ResourceContainer(
+    message_types.VoidMessage,
+    ticket=messages.StringField(1))
+
+SEARCH_CONFERENCES_REQUEST = endpoints.ResourceContainer(
+    message_types.VoidMessage,
+    query=messages.StringField(1),
+    page_size=messages.IntegerField(2),
+    page_token=messages.StringField(3))
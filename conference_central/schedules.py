@@ -0,0 +1,168 @@
+"""Materialized conference session schedules for Conference Central.
+
+All of a conference's sessions, with their speakers, are kept as session
+messages sorted by date and start time in one compressed
+`ConferenceSchedule` blob in the conference's entity group. The blob is
+updated in the same transaction that stores or deletes sessions and is
+served from memcache, so the conference session listings slice one cached
+value instead of querying sessions and getting their speakers.
+"""
+
+import bisect
+import zlib
+
+from google.appengine.api import memcache
+from google.appengine.ext import ndb
+from protorpc import protojson
+
+import featured_speakers
+from models import ConferenceSchedule
+from models import Session
+from models import SessionsResponseMessage
+
+MEMCACHE_SCHEDULE_KEY = "SCHEDULE:{0}"
+# Bounds how long a schedule cached while sessions change can be stale
+SCHEDULE_CACHE_TIME = 600
+# Sessions, the schedule and speaker counts must fit in one commit
+PUT_BATCH_SIZE = 498
+
+
+def _schedule_key(conference_key):
+    """Get the key of a conference's ConferenceSchedule entity."""
+    return ndb.Key(ConferenceSchedule, 'schedule', parent=conference_key)
+
+
+def _cache_key(conference_key):
+    """Get the memcache key of a conference's cached schedule."""
+    return MEMCACHE_SCHEDULE_KEY.format(conference_key.urlsafe())
+
+
+def _sort_key(session_message):
+    """Order sessions by date, then start time (both ISO format strings)."""
+    return session_message.date, session_message.start_time
+
+
+def _encode(session_messages):
+    """Compress session messages into a schedule blob, sorted."""
+    return zlib.compress(protojson.encode_message(SessionsResponseMessage(
+        sessions=sorted(session_messages, key=_sort_key))))
+
+
+def _decode(data):
+    """Get the (sorted) session messages of a schedule blob."""
+    return protojson.decode_message(
+        SessionsResponseMessage, zlib.decompress(data)).sessions
+
+
+@ndb.non_transactional
+def _to_messages(sessions):
+    """Convert sessions to messages, getting speakers outside any transaction.
+
+    Speakers are root entities, so can't be read in a conference transaction.
+    """
+    return Session.to_messages(sessions).sessions
+
+
+def _build(conference_key):
+    """Build (unsaved) the schedule of a conference from its sessions."""
+    # Ancestor query means we get strongly-consistent results
+    return ConferenceSchedule(
+        key=_schedule_key(conference_key),
+        data=_encode(_to_messages(
+            Session.query(ancestor=conference_key).fetch())))
+
+
+def _cache(conference_key, data):
+    """Cache a conference's schedule blob once committed."""
+    cache_key = _cache_key(conference_key)
+    # Outside a transaction the callback runs immediately
+    ndb.get_context().call_on_commit(lambda: memcache.set(
+        cache_key, data, time=SCHEDULE_CACHE_TIME))
+
+
+@ndb.transactional
+def _put_sessions(conference_key, sessions, session_messages):
+    """Store sessions and update the schedule and speaker counts, atomically."""
+    schedule = _schedule_key(conference_key).get() or _build(conference_key)
+    scheduled = _decode(schedule.data)
+
+    # Sessions already in the schedule are being updated
+    ids = set(session_message.id for session_message in session_messages)
+    updated = [ndb.Key(urlsafe=session_message.id) for
+               session_message in scheduled if session_message.id in ids]
+    featured_speakers.record_sessions(
+        conference_key, added=sessions, removed=ndb.get_multi(updated))
+
+    schedule.data = _encode([session_message for session_message in scheduled
+                             if session_message.id not in ids] +
+                            session_messages)
+    ndb.put_multi(sessions + [schedule])
+    _cache(conference_key, schedule.data)
+
+
+def put_sessions(conference_key, sessions):
+    """Store new or updated `sessions` of a conference.
+
+    Sessions must have complete keys. Call
+    `featured_speakers.schedule_update` afterwards to update the featured
+    speaker.
+    """
+    session_messages = _to_messages(sessions)
+    for i in range(0, len(sessions), PUT_BATCH_SIZE):
+        _put_sessions(conference_key, sessions[i:i + PUT_BATCH_SIZE],
+                      session_messages[i:i + PUT_BATCH_SIZE])
+
+
+@ndb.transactional
+def delete_sessions(conference_key, session_keys):
+    """Delete sessions of a conference, updating the schedule."""
+    schedule = _schedule_key(conference_key).get() or _build(conference_key)
+    ids = set(session_key.urlsafe() for session_key in session_keys)
+    schedule.data = _encode([session_message for session_message in
+                             _decode(schedule.data) if
+                             session_message.id not in ids])
+
+    featured_speakers.record_sessions(conference_key, removed=[
+        session for session in ndb.get_multi(session_keys) if session])
+    ndb.delete_multi(session_keys)
+    schedule.put()
+    _cache(conference_key, schedule.data)
+
+
+@ndb.transactional
+def _get_or_build(conference_key):
+    """Get a conference's schedule blob, building it the first time.
+
+    Returns None if there is no such conference.
+    """
+    conference, schedule = ndb.get_multi(
+        [conference_key, _schedule_key(conference_key)])
+    if not conference:
+        return None
+    if not schedule:
+        schedule = _build(conference_key)
+        schedule.put()
+    return schedule.data
+
+
+def get_schedule(conference_key):
+    """Get a conference's session messages, sorted by date and start time.
+
+    Returns None if there is no such conference.
+    """
+    data = memcache.get(_cache_key(conference_key))
+    if data is None:
+        data = _get_or_build(conference_key)
+        if data is None:
+            return None
+        # Don't replace a newer schedule cached by a concurrent update
+        memcache.add(_cache_key(conference_key), data,
+                     time=SCHEDULE_CACHE_TIME)
+    return _decode(data)
+
+
+def on_date(schedule, date):
+    """Slice the sessions on `date` out of a (sorted) schedule."""
+    dates = [session_message.date for session_message in schedule]
+    return schedule[bisect.bisect_left(dates, str(date)):
+                    bisect.bisect_right(dates, str(date))]
@@ -0,0 +1,191 @@
+"""Sharded seat counter for Conference Central.
+
+A conference's available seats are spread over `NUM_SHARDS` root `SeatShard`
+entities, so a registration only writes one randomly chosen shard instead of
+every registration contending on the `Conference` entity group. The total is
+served from memcache and adjusted as seats are reserved and released, after
+which `announcements` is told of the new total.
+"""
+
+import random
+
+from google.appengine.api import memcache
+from google.appengine.ext import ndb
+
+import announcements
+from models import SeatShard
+
+NUM_SHARDS = 10
+MEMCACHE_SEATS_KEY = "SEATS:{0}"
+# Bounds how long a sum cached while a registration commits can be off by one
+SEATS_CACHE_TIME = 60
+
+
+def _shard_keys(conference_key):
+    """Get the keys of all the seat shards for a conference."""
+    return [ndb.Key(SeatShard, '{0}-{1}'.format(conference_key.urlsafe(), i))
+            for i in range(NUM_SHARDS)]
+
+
+def _new_shards(conference_key, seats):
+    """Create (unsaved) shards splitting `seats` as evenly as possible."""
+    return [SeatShard(key=key, seats=seats // NUM_SHARDS +
+                      (1 if i < seats % NUM_SHARDS else 0))
+            for i, key in enumerate(_shard_keys(conference_key))]
+
+
+def _cache_key(conference_key):
+    """Get the memcache key of a conference's cached seat total."""
+    return MEMCACHE_SEATS_KEY.format(conference_key.urlsafe())
+
+
+def _drop_cache(conference_key):
+    """Drop the cached total once committed."""
+    cache_key = _cache_key(conference_key)
+    # Outside a transaction the callback runs immediately
+    ndb.get_context().call_on_commit(lambda: memcache.delete(cache_key))
+
+
+def _seats_changed(conference, delta):
+    """Adjust the cached total and the announcement once committed."""
+    cache_key = _cache_key(conference.key)
+
+    def callback():
+        if delta < 0:
+            seats = memcache.decr(cache_key, -delta)
+        else:
+            seats = memcache.incr(cache_key, delta)
+        if seats is None:
+            # Not cached; sum (and cache) the committed shards
+            seats = get_counts([conference])[0]
+        announcements.seats_changed(conference, seats, delta)
+
+    # Outside a transaction the callback runs immediately
+    ndb.get_context().call_on_commit(callback)
+
+
+def reset(conference_key, seats):
+    """Set the number of available seats for a conference."""
+    reset_multi({conference_key: seats})
+
+
+def reset_multi(seats_by_conference_key):
+    """Set the number of available seats for several conferences at once."""
+    ndb.put_multi([shard for conference_key, seats in
+                   seats_by_conference_key.items() for
+                   shard in _new_shards(conference_key, seats)])
+    for conference_key in seats_by_conference_key:
+        _drop_cache(conference_key)
+
+
+@ndb.non_transactional
+def get_counts(conferences, fresh=False):
+    """Get the number of available seats for each of `conferences`.
+
+    With `fresh`, the committed shards are summed (and recached) even if a
+    total is cached.
+    """
+    cache_keys = [_cache_key(conference.key) for conference in conferences]
+    counts = {} if fresh else memcache.get_multi(cache_keys)
+
+    missing = [(cache_key, conference) for cache_key, conference in
+               zip(cache_keys, conferences) if cache_key not in counts]
+    if missing:
+        shards = ndb.get_multi([key for _, conference in missing for
+                                key in _shard_keys(conference.key)])
+        totals = {}
+        for i, (cache_key, conference) in enumerate(missing):
+            conference_shards = shards[i * NUM_SHARDS:(i + 1) * NUM_SHARDS]
+            if any(conference_shards):
+                totals[cache_key] = sum(
+                    shard.seats for shard in conference_shards if shard)
+            else:
+                # Conference created before seats were sharded
+                totals[cache_key] = conference.seatsAvailable or 0
+        memcache.set_multi(totals, time=SEATS_CACHE_TIME)
+        counts.update(totals)
+
+    return [counts[cache_key] for cache_key in cache_keys]
+
+
+def get_changed_conference_keys(since, limit):
+    """Get the keys of (up to `limit`) conferences whose seats changed.
+
+    Those changed most recently, since `since`, come first.
+    """
+    conference_keys = []
+    shard_keys = SeatShard.query(SeatShard.updated >= since).order(
+        -SeatShard.updated).iter(keys_only=True)
+    for shard_key in shard_keys:
+        # Shards are named after their conference's url-safe key
+        conference_key = ndb.Key(urlsafe=shard_key.id().rsplit('-', 1)[0])
+        if conference_key not in conference_keys:
+            conference_keys.append(conference_key)
+            if len(conference_keys) == limit:
+                break
+    return conference_keys
+
+
+def _get_shards_in_random_order(conference):
+    """Yield a conference's shards one at a time, in random order.
+
+    Shards are read lazily so that only the shards actually looked at join
+    the calling transaction. Conferences created before seats were sharded
+    get their shards created from `Conference.seatsAvailable`.
+    """
+    keys = _shard_keys(conference.key)
+    random.shuffle(keys)
+    found = False
+    for key in keys:
+        shard = key.get()
+        if shard:
+            found = True
+            yield shard
+
+    if not found:
+        shards = _new_shards(conference.key, conference.seatsAvailable or 0)
+        random.shuffle(shards)
+        # Unmodified shards must still be written for the migration to stick
+        ndb.put_multi(shards)
+        for shard in shards:
+            yield shard
+
+
+def reserve_many(conference, count):
+    """Take up to `count` seats for `conference`, returning how many were.
+
+    Must be called in a cross-group transaction; a shard never goes below
+    zero, so seats cannot be oversold.
+    """
+    taken = 0
+    for shard in _get_shards_in_random_order(conference):
+        take = min(shard.seats, count - taken)
+        if take > 0:
+            shard.seats -= take
+            shard.put()
+            taken += take
+        if taken == count:
+            break
+
+    if taken:
+        _seats_changed(conference, -taken)
+    return taken
+
+
+def reserve(conference):
+    """Take one seat for `conference`, returning False if it is sold out.
+
+    Must be called in a cross-group transaction.
+    """
+    return reserve_many(conference, 1) == 1
+
+
+def release(conference):
+    """Give one seat for `conference` back to a random shard.
+
+    Must be called in a cross-group transaction.
+    """
+    shard = next(_get_shards_in_random_order(conference))
+    shard.seats += 1
+    shard.put()
+    _seats_changed(conference, 1)
@@ -0,0 +1,66 @@
+"""Precompiled ndb entity to ProtoRPC message serializers.
+
+The field mapping for a (model, message) pair is worked out once, when the
+pair is registered, instead of inspecting every message field with
+`hasattr`/`getattr` for every entity serialized.
+"""
+
+import operator
+
+from google.appengine.ext import ndb
+
+_serializers = {}
+
+
+def _string_getter(name):
+    """Get attribute `name` as a string (e.g. for dates and times)."""
+    get = operator.attrgetter(name)
+    return lambda entity: str(get(entity))
+
+
+class Serializer(object):
+
+    """Serializer of one ndb model to one ProtoRPC message class."""
+
+    def __init__(self, model, message, computed):
+        self.message = message
+        self.plan = []
+        for field in message.all_fields():
+            if field.name in computed:
+                getter = computed[field.name]
+            elif field.name in model._properties:
+                # Dates and times go out as strings; just copy others
+                if isinstance(model._properties[field.name],
+                              ndb.DateTimeProperty):
+                    getter = _string_getter(field.name)
+                else:
+                    getter = operator.attrgetter(field.name)
+            else:
+                continue
+            self.plan.append((field.name, getter))
+        self.check = any(field.required for field in message.all_fields())
+
+    def __call__(self, entity, **values):
+        """Serialize `entity`; `values` are set on (or override) the message."""
+        fields = dict((name, getter(entity)) for name, getter in self.plan)
+        fields.update(values)
+        message = self.message(**fields)
+        if self.check:
+            message.check_initialized()
+        return message
+
+
+def register(model, message, **computed):
+    """Register a serializer of `model` entities to `message` messages.
+
+    Message fields named in `computed` are set from the given function of the
+    entity; other fields are copied from the model property of the same name.
+    """
+    serializer = _serializers[(model, message)] = Serializer(
+        model, message, computed)
+    return serializer
+
+
+def serialize(entity, message, **values):
+    """Serialize `entity` to a `message` using its registered serializer."""
+    return _serializers[(type(entity), message)](entity, **values)
@@ -0,0 +1,64 @@
+"""Session queries that exclude session types within a time range.
+
+Datastore queries allow inequality filters on one property only, so "not a
+workshop, before 7pm" can't be written directly. `plan_sessions_query` uses
+the registry of session types in use (`SessionType` entities, maintained by
+`register_session_type`) and precomputed flags such as `Session.is_workshop`
+to turn a type exclusion into an equality filter, so the query stays a
+single indexed query with one inequality (on `start_time`).
+"""
+
+from google.appengine.ext import ndb
+
+from models import Session
+from models import SessionType
+
+# Session types with a precomputed flag property on Session
+TYPE_FLAGS = {
+    'workshop': Session.is_workshop,
+}
+
+
+def register_session_type(type_of_session):
+    """Add a session type to the registry, if it isn't there already."""
+    key = ndb.Key(SessionType, type_of_session)
+    # Usually served by ndb's caches, and written once per new type
+    if not key.get():
+        SessionType(key=key).put()
+
+
+def get_session_types():
+    """Get the set of session types in use."""
+    return set(key.id() for key in SessionType.query().fetch(keys_only=True))
+
+
+def plan_sessions_query(exclude_types=(), before=None, after=None):
+    """Plan a query for sessions not of `exclude_types`, between two times.
+
+    Returns `(query, post_filter)`. `query` is None if no session can match;
+    `post_filter` is None, or a predicate that sessions from `query` must
+    also satisfy when the exclusion couldn't be done by the datastore.
+    """
+    query = Session.query()
+    if before is not None:
+        query = query.filter(Session.start_time <= before)
+    if after is not None:
+        query = query.filter(Session.start_time >= after)
+    query = query.order(Session.start_time, Session.key)
+
+    exclude_types = set(exclude_types)
+    if not exclude_types:
+        return query, None
+
+    remaining_types = get_session_types() - exclude_types
+    if not remaining_types:
+        return None, None
+    if len(remaining_types) == 1:
+        # Excluding all but one type is an equality on the one left
+        return query.filter(
+            Session.type_of_session == remaining_types.pop()), None
+    if len(exclude_types) == 1 and exclude_types <= set(TYPE_FLAGS):
+        return query.filter(TYPE_FLAGS[exclude_types.pop()] == False), None
+
+    # Fall back to filtering types in memory over the time range query
+    return query, lambda session: session.type_of_session not in exclude_types
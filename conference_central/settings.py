@@ -16,3 +16,6 @@ WEB_CLIENT_ID = 'replace with web client id'
 ANDROID_CLIENT_ID = 'replace with Android client ID'
 IOS_CLIENT_ID = 'replace with iOS client ID'
 ANDROID_AUDIENCE = WEB_CLIENT_ID
+
+# Count API calls & time every ConferenceApi method (see instrumentation.py)
+INSTRUMENT_ENDPOINTS = True
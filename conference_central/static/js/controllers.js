@@ -260,7 +260,7 @@ conferenceApp.controllers.controller('ShowConferenceCtrl', function ($scope, $lo
     $scope.selectedTab = 'ALL';
 
     /**
-     * Holds the filters that will be applied when queryConferencesAll is invoked.
+     * Holds the filters that will be applied when queryConferences is invoked on the 'ALL' tab.
      * @type {Array}
      */
     $scope.filters = [
@@ -288,7 +288,7 @@ conferenceApp.controllers.controller('ShowConferenceCtrl', function ($scope, $lo
     ];
 
     /**
-     * Holds the conferences currently displayed in the page.
+     * Holds the conferences currently displayed in the page (one page, fetched on demand).
      * @type {Array}
      */
     $scope.conferences = [];
@@ -346,24 +346,51 @@ conferenceApp.controllers.controller('ShowConferenceCtrl', function ($scope, $lo
     $scope.pagination = $scope.pagination || {};
     $scope.pagination.currentPage = 0;
     $scope.pagination.pageSize = 20;
+    /**
+     * Holds the total number of conferences, as counted by the server.
+     * @type {number}
+     */
+    $scope.pagination.totalCount = 0;
+    $scope.pagination.truncated = false;
     /**
      * Returns the number of the pages in the pagination.
      *
      * @returns {number}
      */
     $scope.pagination.numberOfPages = function () {
-        return Math.ceil($scope.conferences.length / $scope.pagination.pageSize);
+        return Math.ceil($scope.pagination.totalCount / $scope.pagination.pageSize);
     };
 
     /**
-     * Returns an array including the numbers from 1 to the number of the pages.
+     * Shows a page, requesting it from the server.
+     *
+     * @param page the number of the page, from 0.
+     */
+    $scope.pagination.goTo = function (page) {
+        if (page >= 0 && page < $scope.pagination.numberOfPages() &&
+            page != $scope.pagination.currentPage) {
+            $scope.fetchPage(page);
+        }
+    };
+
+    /**
+     * Holds the number of page links shown around the current page.
+     * @type {number}
+     */
+    $scope.pagination.pageLinks = 10;
+
+    /**
+     * Returns an array including the numbers of the pages to link to, around the current page.
      *
      * @returns {Array}
      */
     $scope.pagination.pageArray = function () {
         var pages = [];
         var numberOfPages = $scope.pagination.numberOfPages();
-        for (var i = 0; i < numberOfPages; i++) {
+        var first = Math.max(0, Math.min(
+            $scope.pagination.currentPage - Math.floor($scope.pagination.pageLinks / 2),
+            numberOfPages - $scope.pagination.pageLinks));
+        for (var i = first; i < Math.min(numberOfPages, first + $scope.pagination.pageLinks); i++) {
             pages.push(i);
         }
         return pages;
@@ -409,117 +436,82 @@ conferenceApp.controllers.controller('ShowConferenceCtrl', function ($scope, $lo
     };
 
     /**
-     * Query the conferences depending on the tab currently selected.
-     *
+     * Feeds of the conference.getConferenceFeed API, by tab.
      */
-    $scope.queryConferences = function () {
-        $scope.submitted = false;
-        if ($scope.selectedTab == 'ALL') {
-            $scope.queryConferencesAll();
-        } else if ($scope.selectedTab == 'YOU_HAVE_CREATED') {
-            $scope.getConferencesCreated();
-        } else if ($scope.selectedTab == 'YOU_WILL_ATTEND') {
-            $scope.getConferencesAttend();
-        }
+    $scope.feeds = {
+        ALL: 'ALL',
+        YOU_HAVE_CREATED: 'CREATED',
+        YOU_WILL_ATTEND: 'ATTENDING'
     };
 
     /**
-     * Invokes the conference.queryConferences API.
+     * Possible orders of the conferences, sorted by the server.
+     *
+     * @type {{displayName: string, enumValue: string}[]}
      */
-    $scope.queryConferencesAll = function () {
-        var sendFilters = {
-            filters: []
-        }
-        for (var i = 0; i < $scope.filters.length; i++) {
-            var filter = $scope.filters[i];
-            if (filter.field && filter.operator && filter.value) {
-                sendFilters.filters.push({
-                    field: filter.field.enumValue,
-                    operator: filter.operator.enumValue,
-                    value: filter.value
-                });
-            }
-        }
-        $scope.loading = true;
-        gapi.client.conference.queryConferences(sendFilters).
-            execute(function (resp) {
-                $scope.$apply(function () {
-                    $scope.loading = false;
-                    if (resp.error) {
-                        // The request has failed.
-                        var errorMessage = resp.error.message || '';
-                        $scope.messages = 'Failed to query conferences : ' + errorMessage;
-                        $scope.alertStatus = 'warning';
-                        $log.error($scope.messages + ' filters : ' + JSON.stringify(sendFilters));
-                    } else {
-                        // The request has succeeded.
-                        $scope.submitted = false;
-                        $scope.messages = 'Query succeeded : ' + JSON.stringify(sendFilters);
-                        $scope.alertStatus = 'success';
-                        $log.info($scope.messages);
+    $scope.sortOptions = [
+        {displayName: 'Start date', enumValue: 'START_DATE'},
+        {displayName: 'Seats available', enumValue: 'SEATS_AVAILABLE'},
+        {displayName: 'Name', enumValue: 'NAME'}
+    ];
 
-                        $scope.conferences = [];
-                        angular.forEach(resp.items, function (conference) {
-                            $scope.conferences.push(conference);
-                        });
-                    }
-                    $scope.submitted = true;
-                });
-            });
-    }
+    $scope.sortOption = $scope.sortOptions[0];
 
     /**
-     * Invokes the conference.getConferencesCreated method.
+     * Holds the request (feed, filters and sort) of the pages being shown.
      */
-    $scope.getConferencesCreated = function () {
-        $scope.loading = true;
-        gapi.client.conference.getConferencesCreated().
-            execute(function (resp) {
-                $scope.$apply(function () {
-                    $scope.loading = false;
-                    if (resp.error) {
-                        // The request has failed.
-                        var errorMessage = resp.error.message || '';
-                        $scope.messages = 'Failed to query the conferences created : ' + errorMessage;
-                        $scope.alertStatus = 'warning';
-                        $log.error($scope.messages);
+    $scope.feedRequest = {};
 
-                        if (resp.code && resp.code == HTTP_ERRORS.UNAUTHORIZED) {
-                            oauth2Provider.showLoginModal();
-                            return;
-                        }
-                    } else {
-                        // The request has succeeded.
-                        $scope.submitted = false;
-                        $scope.messages = 'Query succeeded : Conferences you have created';
-                        $scope.alertStatus = 'success';
-                        $log.info($scope.messages);
-
-                        $scope.conferences = [];
-                        angular.forEach(resp.items, function (conference) {
-                            $scope.conferences.push(conference);
-                        });
-                    }
-                    $scope.submitted = true;
-                });
-            });
+    /**
+     * Query the conferences depending on the tab currently selected,
+     * showing the first page.
+     */
+    $scope.queryConferences = function () {
+        $scope.submitted = false;
+        $scope.feedRequest = {
+            feed: $scope.feeds[$scope.selectedTab],
+            sort: $scope.sortOption.enumValue,
+            filters: []
+        };
+        if ($scope.selectedTab == 'ALL') {
+            for (var i = 0; i < $scope.filters.length; i++) {
+                var filter = $scope.filters[i];
+                if (filter.field && filter.operator && filter.value) {
+                    $scope.feedRequest.filters.push({
+                        field: filter.field.enumValue,
+                        operator: filter.operator.enumValue,
+                        value: filter.value
+                    });
+                }
+            }
+        }
+        $scope.pagination.totalCount = 0;
+        $scope.pagination.truncated = false;
+        $scope.conferences = [];
+        $scope.fetchPage(0);
     };
 
     /**
-     * Retrieves the conferences to attend by calling the conference.getProfile method and
-     * invokes the conference.getConference method n times where n == the number of the conferences to attend.
+     * Invokes the conference.getConferenceFeed API for one page of the current feed.
+     *
+     * @param page the number of the page to show, from 0.
      */
-    $scope.getConferencesAttend = function () {
+    $scope.fetchPage = function (page) {
+        var request = angular.extend({
+            page: page,
+            page_size: $scope.pagination.pageSize
+        }, $scope.feedRequest);
         $scope.loading = true;
-        gapi.client.conference.getConferencesToAttend().
+        gapi.client.conference.getConferenceFeed(request).
             execute(function (resp) {
                 $scope.$apply(function () {
+                    $scope.loading = false;
                     if (resp.error) {
                         // The request has failed.
                         var errorMessage = resp.error.message || '';
-                        $scope.messages = 'Failed to query the conferences to attend : ' + errorMessage;
+                        $scope.messages = 'Failed to query conferences : ' + errorMessage;
                         $scope.alertStatus = 'warning';
-                        $log.error($scope.messages);
+                        $log.error($scope.messages + ' request : ' + JSON.stringify(request));
 
                         if (resp.code && resp.code == HTTP_ERRORS.UNAUTHORIZED) {
                             oauth2Provider.showLoginModal();
@@ -527,9 +519,11 @@ conferenceApp.controllers.controller('ShowConferenceCtrl', function ($scope, $lo
                         }
                     } else {
                         // The request has succeeded.
-                        $scope.conferences = resp.result.items;
-                        $scope.loading = false;
-                        $scope.messages = 'Query succeeded : Conferences you will attend (or you have attended)';
+                        $scope.conferences = resp.items || [];
+                        $scope.pagination.currentPage = page;
+                        $scope.pagination.totalCount = parseInt(resp.total_count, 10);
+                        $scope.pagination.truncated = resp.truncated || false;
+                        $scope.messages = 'Query succeeded : ' + JSON.stringify($scope.feedRequest);
                         $scope.alertStatus = 'success';
                         $log.info($scope.messages);
                     }
@@ -0,0 +1,82 @@
+"""Tests of the nearly sold out announcement (announcements)."""
+
+import datetime
+import unittest
+
+import testing
+
+from google.appengine.ext import ndb
+import webapp2
+
+import announcements
+import main
+import seat_counter
+from models import Conference
+from models import Profile
+
+
+class AnnouncementCronTest(testing.TestbedTestCase):
+
+    def setUp(self):
+        super(AnnouncementCronTest, self).setUp()
+        organizer = ndb.Key(Profile, 'organizer@example.com')
+        self.conferences = [
+            Conference(parent=organizer, name='Conference %d' % i,
+                       startDate=datetime.date(2016, 1, 1), maxAttendees=50)
+            for i in range(3)]
+        ndb.put_multi(self.conferences)
+
+    def run_cron(self):
+        response = webapp2.Request.blank(
+            '/crons/set_announcement').get_response(main.app)
+        self.assertEqual(response.status_int, 204)
+        return announcements.get_announcement()
+
+    def test_registrations_update_the_announcement(self):
+        conference = self.conferences[0]
+        seat_counter.reset(conference.key, 6)
+
+        @ndb.transactional(xg=True)
+        def register():
+            seat_counter.reserve(conference)
+        register()
+        register()
+
+        # The listing is only written by the (debounced) update task
+        self.assertEqual(announcements.get_announcement(), "")
+        tasks = self.testbed.get_stub('taskqueue').get_filtered_tasks(
+            url='/tasks/update_announcement')
+        self.assertEqual(len(tasks), 1)
+        self.assertEqual(announcements.process(), 1)
+        self.assertIn('Conference 0', announcements.get_announcement())
+
+    def test_updates_unlist_conferences(self):
+        conference = self.conferences[0]
+        seat_counter.reset(conference.key, 3)
+        announcements.update([conference], [3])
+        announcements.process()
+        self.assertIn('Conference 0', announcements.get_announcement())
+
+        seat_counter.reset(conference.key, 30)
+        announcements.update([conference], [30])
+        announcements.process()
+        self.assertEqual(announcements.get_announcement(), "")
+
+    def test_cron_lists_conferences_whose_update_was_missed(self):
+        # Seats changed without the announcement being told
+        seat_counter.reset(self.conferences[0].key, 3)
+        seat_counter.reset(self.conferences[1].key, 30)
+        seat_counter.reset(self.conferences[2].key, 2)
+        announcements.update([self.conferences[2]], [2])
+        announcements.process()
+        seat_counter.reset(self.conferences[2].key, 0)
+
+        announcement = self.run_cron()
+
+        self.assertIn('Conference 0', announcement)
+        self.assertNotIn('Conference 1', announcement)
+        self.assertNotIn('Conference 2', announcement)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+"""Tests of bulk session creation (bulk_import)."""
+
+import datetime
+import json
+import unittest
+
+import testing
+
+import endpoints
+from google.appengine.ext import ndb
+import webapp2
+
+import bulk_import
+import main
+from models import Conference
+from models import Profile
+from models import Session
+from models import Speaker
+
+
+class BulkImportTestCase(testing.TestbedTestCase):
+
+    def setUp(self):
+        super(BulkImportTestCase, self).setUp()
+        organizer = ndb.Key(Profile, 'organizer@example.com')
+        self.conference = Conference(
+            parent=organizer, name='Conference',
+            organizerUserId=organizer.id(),
+            startDate=datetime.date(2016, 1, 1))
+        self.conference.put()
+        self.speaker = Speaker(name='Speaker')
+        self.speaker.put()
+
+    def fields(self, **values):
+        fields = {'name': 'Session', 'speaker_key': self.speaker.key.urlsafe(),
+                  'type_of_session': 'talk', 'date': '2016-01-01',
+                  'start_time': '10:00'}
+        fields.update(values)
+        return fields
+
+
+class CreateSessionsTest(BulkImportTestCase):
+
+    def test_duration_is_stored_as_minutes_and_sent_as_string(self):
+        sessions = bulk_import.create_sessions(
+            self.conference, [self.fields(duration='60')])
+
+        self.assertEqual(sessions[0].key.get().duration, 60)
+        self.assertEqual(Session.to_messages(sessions).sessions[0].duration,
+                         '60')
+
+    def test_invalid_batch_writes_nothing(self):
+        with self.assertRaises(endpoints.BadRequestException):
+            bulk_import.create_sessions(self.conference, [
+                self.fields(), self.fields(duration='an hour')])
+
+        self.assertEqual(Session.query(ancestor=self.conference.key).count(),
+                         0)
+
+
+class ImportSessionsHandlerTest(BulkImportTestCase):
+
+    def post(self, body, conference=None,
+             content_type='application/json'):
+        request = webapp2.Request.blank(
+            '/admin/import_sessions?conference={0}'.format(
+                conference or self.conference.key.urlsafe()),
+            POST=body, headers={'Content-Type': content_type})
+        return request.get_response(main.app)
+
+    def test_imports_json_rows(self):
+        response = self.post(json.dumps([
+            self.fields(duration=60), self.fields(speaker_key=None,
+                                                  speaker='New Speaker')]))
+
+        self.assertEqual(response.status_int, 200)
+        self.assertEqual(len(json.loads(response.body)['sessions']), 2)
+
+    def test_imports_csv_rows(self):
+        response = self.post(
+            'name,speaker,type_of_session,date,start_time\r\n'
+            'Session,New Speaker,talk,2016-01-01,10:00\r\n',
+            content_type='text/csv')
+
+        self.assertEqual(response.status_int, 200)
+
+    def test_bad_requests(self):
+        bad_requests = [
+            (json.dumps([self.fields()]), 'not-a-key'),
+            (json.dumps([self.fields()]), self.speaker.key.urlsafe()),
+            ('[{', None),
+            (json.dumps({'sessions': []}), None),
+            (json.dumps([self.fields(date=20160101)]), None),
+            (json.dumps([self.fields(start_time=['10:00'])]), None),
+        ]
+        for body, conference in bad_requests:
+            self.assertEqual(self.post(body, conference).status_int, 400,
+                             (body, conference))
+
+        self.assertEqual(Session.query().count(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+"""Tests of sorted, paged conference feeds (conference_feeds)."""
+
+import datetime
+import unittest
+
+import testing
+
+from google.appengine.ext import ndb
+
+import conference_feeds
+import conference_queries
+import seat_counter
+from models import Conference
+from models import Profile
+
+
+class ConferenceFeedsTest(testing.TestbedTestCase):
+
+    def setUp(self):
+        super(ConferenceFeedsTest, self).setUp()
+        organizer = ndb.Key(Profile, 'organizer@example.com')
+        start_dates = [datetime.date(2016, 3, 1), None,
+                       datetime.date(2016, 1, 1), None,
+                       datetime.date(2016, 2, 1)]
+        self.conferences = [
+            Conference(parent=organizer, name='Conference %d' % i,
+                       city='London', startDate=start_date,
+                       maxAttendees=10 * (i + 1))
+            for i, start_date in enumerate(start_dates)]
+        ndb.put_multi(self.conferences)
+        seat_counter.reset_multi(dict(
+            (conference.key, conference.maxAttendees) for
+            conference in self.conferences))
+
+    def names(self, conferences):
+        return [conference.name for conference in conferences]
+
+    def all_pages(self, plan, sort, limit=2):
+        names = []
+        for offset in range(0, len(self.conferences), limit):
+            conferences, _, total, truncated = conference_feeds.get_all_page(
+                plan, sort, offset, limit)
+            self.assertEqual((total, truncated),
+                             (len(self.conferences), False))
+            names.extend(self.names(conferences))
+        return names
+
+    def test_all_by_start_date_pages_through_datastore_order(self):
+        names = self.all_pages(
+            conference_queries.plan_conferences_query([]), 'START_DATE')
+
+        self.assertEqual(names[:3],
+                         ['Conference 2', 'Conference 4', 'Conference 0'])
+        # Conferences without a start date come last
+        self.assertEqual(sorted(names[3:]), ['Conference 1', 'Conference 3'])
+
+    def test_datastore_and_memory_orders_agree(self):
+        keys = [conference.key for conference in self.conferences]
+        plan = conference_queries.plan_conferences_query([])
+        for sort in ('START_DATE', 'NAME'):
+            in_memory = self.names(conference_feeds.get_page(
+                keys, sort, 0, len(keys))[0])
+            # Ties (no start date) may be broken differently
+            self.assertEqual(self.all_pages(plan, sort)[:3], in_memory[:3],
+                             sort)
+
+    def test_filtered_feed_is_sorted_in_memory(self):
+        plan = conference_queries.plan_conferences_query(
+            [('city', '=', 'London')])
+        self.assertEqual(self.all_pages(plan, 'SEATS_AVAILABLE'), [
+            'Conference 4', 'Conference 3', 'Conference 2', 'Conference 1',
+            'Conference 0'])
+
+    def test_long_feed_is_reported_truncated(self):
+        max_feed_size = conference_feeds.MAX_FEED_SIZE
+        conference_feeds.MAX_FEED_SIZE = 3
+        try:
+            conferences, _, total, truncated = conference_feeds.get_all_page(
+                conference_queries.plan_conferences_query([]),
+                'SEATS_AVAILABLE', 0, 10)
+        finally:
+            conference_feeds.MAX_FEED_SIZE = max_feed_size
+
+        self.assertEqual((len(conferences), total, truncated), (3, 3, True))
+
+
+if __name__ == '__main__':
+    unittest.main()
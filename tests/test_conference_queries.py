@@ -0,0 +1,78 @@
+"""Tests that conference listings run their datastore query once."""
+
+import datetime
+import unittest
+
+import testing
+
+from google.appengine.ext import ndb
+from protorpc import message_types
+
+import common
+import seat_counter
+from conference import ConferenceApi
+from models import Conference
+from models import ConferenceQueryForm
+from models import ConferenceQueryForms
+from models import Profile
+
+QUERY_RPC = 'datastore_v3.RunQuery'
+
+
+class ConferenceListingQueriesTest(testing.TestbedTestCase):
+
+    def setUp(self):
+        super(ConferenceListingQueriesTest, self).setUp()
+        organizer = Profile(key=ndb.Key(Profile, 'organizer@example.com'),
+                            displayName='Organizer',
+                            mainEmail='organizer@example.com')
+        organizer.put()
+        conferences = [
+            Conference(parent=organizer.key, name='Conference %d' % i,
+                       organizerUserId=organizer.key.id(),
+                       organizerDisplayName=organizer.displayName,
+                       city=['London', 'Paris'][i % 2],
+                       startDate=datetime.date(2016, 1 + i % 12, 1),
+                       month=1 + i % 12, maxAttendees=100, seatsAvailable=100)
+            for i in range(30)]
+        ndb.put_multi(conferences)
+        seat_counter.reset_multi(dict(
+            (conference.key, 100) for conference in conferences))
+        common.sign_in(organizer.mainEmail)
+
+    def assertOneQuery(self, call):
+        ndb.get_context().clear_cache()
+        self.rpcs.reset()
+        result = call()
+        self.assertEqual(self.rpcs.calls[QUERY_RPC], 1, self.rpcs.calls)
+        return result
+
+    def query(self, *filters):
+        return ConferenceApi().queryConferences(ConferenceQueryForms(
+            filters=[ConferenceQueryForm(field=field, operator=operator,
+                                         value=value) for
+                     field, operator, value in filters]))
+
+    def test_query_conferences(self):
+        forms = self.assertOneQuery(self.query)
+        self.assertEqual(len(forms.items), 20)
+
+    def test_query_conferences_with_pushed_filters(self):
+        forms = self.assertOneQuery(
+            lambda: self.query(('CITY', 'EQ', 'Paris')))
+        self.assertEqual(len(forms.items), 15)
+
+    def test_query_conferences_with_filters_checked_in_memory(self):
+        forms = self.assertOneQuery(lambda: self.query(
+            ('MONTH', 'GT', '6'), ('CITY', 'NE', 'London')))
+        self.assertEqual(
+            sorted(set(form.city for form in forms.items)), ['Paris'])
+
+    def test_get_conferences_created(self):
+        forms = self.assertOneQuery(lambda: ConferenceApi(
+            ).getConferencesCreated(message_types.VoidMessage()))
+        self.assertEqual(len(forms.items), 30)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+"""Tests of featured speaker updates (featured_speakers)."""
+
+import datetime
+import unittest
+
+import testing
+
+from google.appengine.ext import ndb
+
+import featured_speakers
+import schedules
+from models import Conference
+from models import Profile
+from models import Session
+from models import Speaker
+
+
+class UpdateTest(testing.TestbedTestCase):
+
+    def setUp(self):
+        super(UpdateTest, self).setUp()
+        organizer = ndb.Key(Profile, 'organizer@example.com')
+        self.conference = Conference(
+            parent=organizer, name='Conference',
+            organizerUserId=organizer.id(),
+            startDate=datetime.date(2016, 1, 1))
+        self.conference.put()
+
+    def add_sessions(self, speaker, count):
+        session_ids = Session.allocate_ids(size=count,
+                                           parent=self.conference.key)
+        schedules.put_sessions(self.conference.key, [
+            Session(key=ndb.Key(Session, session_id,
+                                parent=self.conference.key),
+                    speaker_key=speaker.key,
+                    name='{0} {1}'.format(speaker.name, i),
+                    date=datetime.date(2016, 1, 1),
+                    start_time=datetime.time(10))
+            for i, session_id in enumerate(range(session_ids[0],
+                                                 session_ids[1] + 1))])
+
+    def test_most_sessions_is_featured(self):
+        speakers = [Speaker(name='Speaker A'), Speaker(name='Speaker B')]
+        ndb.put_multi(speakers)
+        self.add_sessions(speakers[0], 2)
+        self.add_sessions(speakers[1], 3)
+
+        self.assertEqual(featured_speakers.update(self.conference.key),
+                         'Speaker B: Speaker B 0, Speaker B 1, Speaker B 2')
+
+    def test_deleted_speaker_is_skipped(self):
+        speakers = [Speaker(name='Speaker A'), Speaker(name='Speaker B')]
+        ndb.put_multi(speakers)
+        self.add_sessions(speakers[0], 2)
+        self.add_sessions(speakers[1], 3)
+        speakers[1].key.delete()
+
+        self.assertEqual(featured_speakers.update(self.conference.key),
+                         'Speaker A: Speaker A 0, Speaker A 1')
+
+    def test_deleted_featured_speaker_is_cleared(self):
+        speaker = Speaker(name='Speaker')
+        speaker.put()
+        self.add_sessions(speaker, 2)
+        self.assertTrue(featured_speakers.get(self.conference.key))
+        speaker.key.delete()
+
+        self.assertIsNone(featured_speakers.update(self.conference.key))
+        self.assertEqual(featured_speakers.get(self.conference.key), "")
+
+
+if __name__ == '__main__':
+    unittest.main()
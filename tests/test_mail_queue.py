@@ -0,0 +1,55 @@
+"""Tests of queued, batched email (mail_queue)."""
+
+import unittest
+
+import testing
+
+from google.appengine.ext import testbed
+
+import mail_queue
+from models import OutboundEmail
+
+
+class MailQueueTest(testing.TestbedTestCase):
+
+    def enqueue(self, to, name):
+        return mail_queue.enqueue('conference_created', to, [
+            {'name': name, 'city': 'London', 'startDate': '2017-01-01',
+             'endDate': '2017-01-02'}])
+
+    def test_emails_to_the_same_recipient_are_merged(self):
+        emails = [self.enqueue('a@example.com', 'One'),
+                  self.enqueue('a@example.com', 'Two'),
+                  self.enqueue('b@example.com', 'Three')]
+
+        self.assertEqual(mail_queue.send_pending(), 3)
+
+        sent = self.testbed.get_stub(
+            testbed.MAIL_SERVICE_NAME).get_sent_messages()
+        self.assertEqual(len(sent), 2)
+        self.assertEqual([email.key.get().status for email in emails],
+                         [OutboundEmail.SENT] * 3)
+
+    def test_failed_batch_is_drained_again(self):
+        self.enqueue('a@example.com', 'One')
+        taskqueue_stub = self.testbed.get_stub(testbed.TASKQUEUE_SERVICE_NAME)
+        drains = len(taskqueue_stub.get_filtered_tasks(url='/tasks/send_mail'))
+        send_batch = mail_queue._send_batch
+
+        def fail(*args):
+            raise RuntimeError('datastore error')
+        mail_queue._send_batch = fail
+        try:
+            with self.assertRaises(RuntimeError):
+                mail_queue.send_pending()
+        finally:
+            mail_queue._send_batch = send_batch
+
+        # Another drain once the batch's leases have run out
+        self.assertEqual(
+            len(taskqueue_stub.get_filtered_tasks(url='/tasks/send_mail')),
+            drains + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+"""Tests of queued registration (registration_queue)."""
+
+import datetime
+import unittest
+
+import testing
+
+import endpoints
+from google.appengine.ext import ndb
+
+import common
+import registration_queue
+import registrations
+import resource_containers as containers
+import seat_counter
+from conference import ConferenceApi
+from models import Conference
+from models import Profile
+from models import RegistrationTicket
+
+
+class RegistrationQueueTest(testing.TestbedTestCase):
+
+    def setUp(self):
+        super(RegistrationQueueTest, self).setUp()
+        self.profiles = [
+            Profile(key=ndb.Key(Profile, 'user%d@example.com' % i),
+                    displayName='User %d' % i,
+                    mainEmail='user%d@example.com' % i)
+            for i in range(3)]
+        ndb.put_multi(self.profiles)
+        self.conference = Conference(
+            parent=self.profiles[0].key, name='Conference',
+            organizerUserId=self.profiles[0].key.id(),
+            startDate=datetime.date(2016, 1, 1), maxAttendees=2,
+            seatsAvailable=2)
+        self.conference.put()
+        seat_counter.reset(self.conference.key, 2)
+
+    def enqueue_all(self):
+        return [registration_queue.enqueue(profile.key, self.conference.key)
+                for profile in self.profiles]
+
+    def test_seats_go_first_come_first_served(self):
+        tickets = self.enqueue_all()
+
+        self.assertEqual(registration_queue.process(self.conference.key), 3)
+
+        self.assertEqual([ticket.key.get().status for ticket in tickets], [
+            RegistrationTicket.REGISTERED, RegistrationTicket.REGISTERED,
+            RegistrationTicket.REJECTED])
+        self.assertEqual(seat_counter.get_counts([self.conference]), [0])
+
+    def test_failed_batch_is_leased_again(self):
+        tickets = self.enqueue_all()
+        register_batch = registration_queue._register_batch
+
+        def fail(*args):
+            raise RuntimeError('collision')
+        registration_queue._register_batch = fail
+        try:
+            with self.assertRaises(RuntimeError):
+                registration_queue.process(self.conference.key)
+        finally:
+            registration_queue._register_batch = register_batch
+
+        # As when the push task is retried straight away
+        self.assertEqual(registration_queue.process(self.conference.key), 3)
+        self.assertNotIn(RegistrationTicket.PENDING,
+                         [ticket.key.get().status for ticket in tickets])
+
+    def test_ticket_must_be_a_ticket(self):
+        registration = registrations.new_registration(
+            self.profiles[1].key, self.conference.key)
+        registration.put()
+        common.sign_in(self.profiles[1].mainEmail)
+
+        with self.assertRaises(endpoints.NotFoundException):
+            ConferenceApi().get_registration_ticket(
+                containers.REGISTRATION_TICKET_REQUEST.combined_message_class(
+                    ticket=registration.key.urlsafe()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+"""Tests of Registration entities (registrations)."""
+
+import datetime
+import unittest
+
+import testing
+
+from google.appengine.ext import ndb
+
+import common
+import resource_containers as containers
+import seat_counter
+from conference import ConferenceApi
+from models import Conference
+from models import Profile
+
+QUERY_RPC = 'datastore_v3.RunQuery'
+
+
+class ConferenceAttendeesTest(testing.TestbedTestCase):
+
+    def setUp(self):
+        super(ConferenceAttendeesTest, self).setUp()
+        self.profiles = [
+            Profile(key=ndb.Key(Profile, 'user%d@example.com' % i),
+                    displayName='User %d' % i,
+                    mainEmail='user%d@example.com' % i)
+            for i in range(3)]
+        ndb.put_multi(self.profiles)
+        organizer = self.profiles[0]
+        self.conference = Conference(
+            parent=organizer.key, name='Conference',
+            organizerUserId=organizer.key.id(),
+            startDate=datetime.date(2016, 1, 1),
+            maxAttendees=10, seatsAvailable=10)
+        self.conference.put()
+        seat_counter.reset(self.conference.key, 10)
+        self.api = ConferenceApi()
+
+    def register(self, profile):
+        common.sign_in(profile.mainEmail)
+        self.api.registerForConference(
+            containers.CONF_GET_REQUEST.combined_message_class(
+                websafeConferenceKey=self.conference.key.urlsafe()))
+
+    def test_attendees_are_counted_from_seats(self):
+        for profile in self.profiles[1:]:
+            self.register(profile)
+
+        common.sign_in(self.profiles[0].mainEmail)
+        ndb.get_context().clear_cache()
+        self.rpcs.reset()
+        attendees = self.api.get_conference_attendees(
+            containers.CONFERENCE_REQUEST.combined_message_class(
+                conference=self.conference.key.urlsafe()))
+
+        self.assertEqual(attendees.count, 2)
+        self.assertEqual(
+            sorted(profile.mainEmail for profile in attendees.attendees),
+            ['user1@example.com', 'user2@example.com'])
+        # Only the page of attendees is queried; the count isn't a query
+        self.assertEqual(self.rpcs.calls[QUERY_RPC], 1, self.rpcs.calls)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+"""Tests of materialized session schedules (schedules)."""
+
+import datetime
+import unittest
+
+import testing
+
+from google.appengine.api import memcache
+from google.appengine.ext import ndb
+
+import schedules
+from models import Conference
+from models import Profile
+from models import Session
+from models import Speaker
+
+
+class ScheduleTest(testing.TestbedTestCase):
+
+    def setUp(self):
+        super(ScheduleTest, self).setUp()
+        self.conference = Conference(
+            parent=ndb.Key(Profile, 'organizer@example.com'),
+            name='Conference', startDate=datetime.date(2016, 1, 1))
+        self.conference.put()
+        self.speaker = Speaker(name='Speaker')
+        self.speaker.put()
+
+    def new_session(self, name, day, hour):
+        session_id = Session.allocate_ids(size=1,
+                                          parent=self.conference.key)[0]
+        return Session(
+            key=ndb.Key(Session, session_id, parent=self.conference.key),
+            name=name, speaker_key=self.speaker.key,
+            date=datetime.date(2016, 1, day), start_time=datetime.time(hour))
+
+    def names(self, session_messages):
+        return [session_message.name for session_message in session_messages]
+
+    def test_schedule_is_sorted_and_follows_writes(self):
+        late, early, next_day = (self.new_session('Late', 1, 15),
+                                 self.new_session('Early', 1, 9),
+                                 self.new_session('Next day', 2, 9))
+        schedules.put_sessions(self.conference.key, [late, next_day, early])
+        self.assertEqual(self.names(schedules.get_schedule(
+            self.conference.key)), ['Early', 'Late', 'Next day'])
+
+        late.name = 'Later'
+        schedules.put_sessions(self.conference.key, [late])
+        schedules.delete_sessions(self.conference.key, [early.key])
+
+        schedule = schedules.get_schedule(self.conference.key)
+        self.assertEqual(self.names(schedule), ['Later', 'Next day'])
+        self.assertEqual(self.names(schedules.on_date(
+            schedule, datetime.date(2016, 1, 2))), ['Next day'])
+
+    def test_schedule_is_built_from_existing_sessions(self):
+        ndb.put_multi([self.new_session('Existing', 1, 10)])
+        memcache.flush_all()
+
+        self.assertEqual(self.names(schedules.get_schedule(
+            self.conference.key)), ['Existing'])
+
+    def test_no_schedule_for_missing_conference(self):
+        self.assertIsNone(schedules.get_schedule(
+            ndb.Key(Conference, 'missing')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+"""Tests of the sharded seat counter (seat_counter)."""
+
+import datetime
+import unittest
+
+import testing
+
+from google.appengine.api import memcache
+from google.appengine.ext import ndb
+
+import seat_counter
+from models import Conference
+from models import Profile
+
+
+class SeatCounterTest(testing.TestbedTestCase):
+
+    def setUp(self):
+        super(SeatCounterTest, self).setUp()
+        self.conference = Conference(
+            parent=ndb.Key(Profile, 'organizer@example.com'),
+            name='Conference', startDate=datetime.date(2016, 1, 1),
+            maxAttendees=25, seatsAvailable=25)
+        self.conference.put()
+        seat_counter.reset(self.conference.key, 25)
+
+    def reserve(self):
+        return ndb.transactional(xg=True)(seat_counter.reserve)(
+            self.conference)
+
+    def shard_total(self):
+        return sum(shard.seats for shard in ndb.get_multi(
+            seat_counter._shard_keys(self.conference.key)))
+
+    def test_seats_are_never_oversold(self):
+        reserved = [self.reserve() for _ in range(26)]
+
+        self.assertEqual(reserved.count(True), 25)
+        self.assertFalse(reserved[-1])
+        self.assertEqual(seat_counter.get_counts([self.conference]), [0])
+        self.assertEqual(self.shard_total(), 0)
+
+    def test_cached_total_follows_reservations_and_releases(self):
+        self.assertEqual(seat_counter.get_counts([self.conference]), [25])
+
+        self.reserve()
+        self.reserve()
+        ndb.transactional(xg=True)(seat_counter.release)(self.conference)
+
+        # Served from memcache, and agrees with the shards
+        self.assertEqual(memcache.get(
+            seat_counter._cache_key(self.conference.key)), 24)
+        self.assertEqual(seat_counter.get_counts([self.conference]), [24])
+        self.assertEqual(self.shard_total(), 24)
+
+    def test_conference_without_shards_uses_its_seats(self):
+        legacy = Conference(
+            parent=ndb.Key(Profile, 'organizer@example.com'),
+            name='Legacy', seatsAvailable=7)
+        legacy.put()
+
+        self.assertEqual(seat_counter.get_counts([legacy]), [7])
+        self.assertTrue(ndb.transactional(xg=True)(seat_counter.reserve)(
+            legacy))
+        self.assertEqual(seat_counter.get_counts([legacy]), [6])
+
+
+if __name__ == '__main__':
+    unittest.main()
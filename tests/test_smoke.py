@@ -0,0 +1,20 @@
+"""Smoke tests: the WSGI applications can be imported."""
+
+import unittest
+
+import testing
+
+
+class ImportTest(testing.TestbedTestCase):
+
+    def test_conference_api(self):
+        import conference
+        self.assertTrue(conference.api)
+
+    def test_main_app(self):
+        import main
+        self.assertTrue(main.app)
+
+
+if __name__ == '__main__':
+    unittest.main()
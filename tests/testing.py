@@ -0,0 +1,31 @@
+"""Shared setup for the Conference Central tests.
+
+The tests run against the App Engine SDK's local service stubs, set up as
+for the benchmarks (see benchmarks/common.py).
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), os.pardir, 'benchmarks'))
+
+import common
+common.setup_paths()
+
+from google.appengine.ext import ndb
+
+
+class TestbedTestCase(unittest.TestCase):
+
+    """Runs each test on fresh testbed stubs, counting their API calls."""
+
+    def setUp(self):
+        self.testbed = common.activate_testbed()
+        ndb.get_context().clear_cache()
+        self.rpcs = common.RpcCounter()
+        self.rpcs.install()
+
+    def tearDown(self):
+        self.testbed.deactivate()